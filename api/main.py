@@ -1,26 +1,32 @@
-from fastapi import FastAPI, HTTPException, Depends, Security, Query, Body
+from fastapi import FastAPI, HTTPException, Depends, Security, Query, Body, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response
 from contextlib import asynccontextmanager
 from typing import Optional
-import httpx
+import asyncio
+import json
 import os
 from dotenv import load_dotenv
 import logging
 from datetime import datetime, timedelta
-from collections import defaultdict
 
 # Import our services
+from services.cache import SingleFlight, TTLCache
+from services.compression import CompressionMiddleware, PrecompressedStaticFiles, precompress_static
+from services.events import EventBroker
 from services.fmcsa import FMCSAService
-from services.loads import LoadService
-from services.metrics import MetricsService
+from services.io_executor import run_blocking
+from services.loads import LoadService, SQLiteLoadService
+from services.metrics import MetricsService, SQLiteMetricsService
+from services.rate_limit import SlidingWindowRateLimiter, parse_limits
+from services.state import create_state_backend
+from services.storage import create_storage
 
 # Import our models
 from models import (
     OfferLogRequest, HappyRobotResponse, CallOutcome, CallSentiment,
-    LoadResponse, CarrierResponse
+    LoadResponse, CarrierResponse, CarrierBatchRequest
 )
 
 # Load environment variables
@@ -33,6 +39,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Data lives in api/data when run from the repo root, data/ when run from api/
+DATA_DIR = "api/data" if os.path.exists("api") else "data"
+
+# Bookings, rate-limit counters and (when shared) the call log. "memory" is
+# for a single worker; "sqlite" lets every worker process on the host share them.
+state_backend = create_state_backend(
+    os.getenv("STATE_BACKEND", "memory"),
+    os.getenv("STATE_PATH", os.path.join(DATA_DIR, "state.db")),
+    # memory backend only: bookings journal, replayed on startup (empty = don't persist)
+    journal_path=os.getenv("BOOKING_JOURNAL", os.path.join(DATA_DIR, "bookings.jsonl"))
+)
+
+# Where loads and calls live: "json" keeps the JSON files in memory; "sqlite"
+# keeps them in indexed tables, imported from the JSON files on startup
+storage = create_storage(
+    os.getenv("STORAGE_BACKEND", "json"),
+    os.getenv("STORAGE_PATH", os.path.join(DATA_DIR, "storage.db"))
+)
+
+async def sync_events(app: FastAPI, interval: float):
+    """Fold in other workers' calls and bookings while dashboards listen, so they get pushed too"""
+    while True:
+        await asyncio.sleep(interval)
+        if app.state.events.subscribers:
+            try:
+                await app.state.metrics.sync()
+                await app.state.loads.sync_bookings()
+            except Exception as e:
+                logger.error(f"Event sync failed: {e}")
+
 # Async context manager for startup/shutdown
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -40,41 +76,116 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Acme Logistics API...")
     
-    # Initialize HTTP client
-    app.state.http_client = httpx.AsyncClient(timeout=15.0)
+    # FMCSA client and caches are built once and shared by every request
+    app.state.fmcsa = FMCSAService(
+        FMCSAService.create_client(
+            max_connections=int(os.getenv("FMCSA_MAX_CONNECTIONS", 20)),
+            max_keepalive_connections=int(os.getenv("FMCSA_MAX_KEEPALIVE", 10)),
+            keepalive_expiry=float(os.getenv("FMCSA_KEEPALIVE_EXPIRY", 30.0)),
+            connect_timeout=float(os.getenv("FMCSA_CONNECT_TIMEOUT", 3.0)),
+            read_timeout=float(os.getenv("FMCSA_READ_TIMEOUT", 10.0)),
+            http2=os.getenv("FMCSA_HTTP2", "false").lower() == "true"
+        ),
+        os.getenv("FMCSA_API_KEY"),
+        os.getenv("FMCSA_BASE_URL", "https://mobile.fmcsa.dot.gov/qc/services"),
+        # Verdict cache (errors are never cached)
+        cache=TTLCache(maxsize=int(os.getenv("FMCSA_CACHE_SIZE", 10000))),
+        cache_ttls={
+            "eligible": float(os.getenv("FMCSA_CACHE_TTL_ELIGIBLE", FMCSAService.CACHE_TTLS["eligible"])),
+            "not_eligible": float(os.getenv("FMCSA_CACHE_TTL_NOT_ELIGIBLE", FMCSAService.CACHE_TTLS["not_eligible"])),
+            "not_found": float(os.getenv("FMCSA_CACHE_TTL_NOT_FOUND", FMCSAService.CACHE_TTLS["not_found"])),
+        },
+        # Concurrent lookups of the same carrier share one FMCSA request
+        single_flight=SingleFlight(),
+        # Latency budget for live calls: retries, hedging, stale fallback
+        deadline=float(os.getenv("FMCSA_DEADLINE", 8.0)) or None,
+        max_retries=int(os.getenv("FMCSA_MAX_RETRIES", 2)),
+        retry_backoff=float(os.getenv("FMCSA_RETRY_BACKOFF", 0.2)),
+        hedge=os.getenv("FMCSA_HEDGE", "false").lower() == "true",
+        hedge_delay=float(os.getenv("FMCSA_HEDGE_DELAY", 1.0))
+    )
     
     # Initialize services
     # Check if we need to initialize data from backup (for persistent volumes)
-    data_dir = "api/data" if os.path.exists("api") else "data"
+    data_dir = DATA_DIR
     loads_path = os.path.join(data_dir, "loads.json")
     
     # ALWAYS use fresh loads from the deployment (data_init)
     # This ensures updates are applied on each deployment
+    # (bookings live in the state backend, so they survive this)
     init_path = os.path.join(data_dir + "_init", "loads.json")
     if os.path.exists(init_path):
         import shutil
         logger.info(f"Updating loads.json from fresh deployment data at {init_path}")
-        shutil.copy(init_path, loads_path)
+        # Copy then rename, so a worker starting alongside never reads a half-written file
+        tmp_path = f"{loads_path}.{os.getpid()}.tmp"
+        shutil.copy(init_path, tmp_path)
+        os.replace(tmp_path, loads_path)
     else:
         # Fallback if no init data (shouldn't happen in production)
         logger.warning("No init data found, using existing loads.json")
     
-    app.state.loads = await LoadService.initialize(loads_path)
+    # Replays the bookings journal / opens the state database, off the event loop
+    await run_blocking(state_backend.open)
+    
+    # Calls and bookings are pushed to dashboards over /events as they happen
+    app.state.events = EventBroker(queue_size=int(os.getenv("EVENTS_QUEUE_SIZE", 256)))
+    
+    if storage is not None:
+        app.state.loads = await SQLiteLoadService.initialize(
+            loads_path, store=storage, state=state_backend, events=app.state.events
+        )
+    else:
+        app.state.loads = await LoadService.initialize(loads_path, state=state_backend, events=app.state.events)
     
     # Use the same directory for metrics
     metrics_path = os.path.join(data_dir, "metrics.json")
-    app.state.metrics = MetricsService(metrics_path)
+    metrics_options = dict(
+        # Calls logged close together share one write + fsync
+        commit_window=float(os.getenv("METRICS_COMMIT_WINDOW", 0.1)),
+        commit_batch=int(os.getenv("METRICS_COMMIT_BATCH", 100)),
+        state=state_backend,
+        events=app.state.events
+    )
+    if storage is not None:
+        app.state.metrics = await SQLiteMetricsService.initialize(metrics_path, store=storage, **metrics_options)
+    else:
+        app.state.metrics = await MetricsService.initialize(metrics_path, **metrics_options)
     
-    logger.info(f"✅ Loaded {len(app.state.loads.loads)} freight loads")
+    logger.info(f"✅ Loaded {await app.state.loads.count()} freight loads")
     logger.info(f"✅ Metrics service initialized")
+    
+    # Dashboard assets are served as .br/.gz copies, compressed once here
+    if os.path.exists(dashboard_path):
+        try:
+            written = await run_blocking(precompress_static, dashboard_path)
+            if written:
+                logger.info(f"✅ Precompressed {written} dashboard files")
+        except OSError as e:
+            logger.warning(f"Could not precompress dashboard files (serving them uncompressed): {e}")
+    
+    # Other workers' changes only reach this worker's streams by syncing
+    event_sync = None
+    if state_backend.shared or storage is not None:
+        event_sync = asyncio.create_task(sync_events(app, float(os.getenv("EVENTS_SYNC_INTERVAL", 1.0))))
+    
     logger.info("🚀 API is ready!")
     
     yield
     
     # Shutdown
     logger.info("Shutting down...")
-    await app.state.http_client.aclose()
+    if event_sync is not None:
+        event_sync.cancel()
+    app.state.events.close()  # end open /events streams so they don't hold up shutdown
+    await app.state.fmcsa.aclose()
+    await app.state.metrics.flush()  # drain the pending group commit
     await app.state.metrics.save()
+    # Both wait for their writer threads to drain
+    await run_blocking(app.state.metrics.close)
+    await run_blocking(state_backend.close)
+    if storage is not None:
+        await run_blocking(storage.close)
     logger.info("👋 Goodbye!")
 
 # Create FastAPI app
@@ -98,19 +209,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
+    expose_headers=["ETag"],  # the dashboard revalidates with it
+)
+
+# br/gzip for JSON and text bodies of COMPRESSION_MIN_SIZE bytes or more
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+    gzip_level=int(os.getenv("GZIP_LEVEL", 6)),
+    brotli_quality=int(os.getenv("BROTLI_QUALITY", 4))
 )
 
 # Security
 security = HTTPBearer()
 
-# Simple in-memory rate limiting for demo
-from collections import defaultdict
-from datetime import datetime, timedelta
-
-rate_limit_storage = defaultdict(list)
-RATE_LIMIT_REQUESTS = 60  # requests per minute
+# Sliding-window rate limiting, per API key (and per route where configured)
+RATE_LIMIT_REQUESTS = int(os.getenv("RATE_LIMIT_REQUESTS", 60))  # requests per minute
+rate_limiter = SlidingWindowRateLimiter(
+    default_limit=RATE_LIMIT_REQUESTS,
+    window=60.0,
+    route_limits=parse_limits(os.getenv("RATE_LIMIT_ROUTES")),  # e.g. "/metrics=120,/api/v1/carriers/batch=10"
+    key_limits=parse_limits(os.getenv("RATE_LIMIT_KEYS")),  # e.g. "partner_key=300"
+    state=state_backend
+)
 
 async def verify_api_key(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Security(security)
 ) -> str:
     """Verify API key with rate limiting"""
@@ -124,32 +248,43 @@ async def verify_api_key(
         logger.warning(f"Invalid API key attempt")
         raise HTTPException(status_code=403, detail="Invalid API Key")
     
-    # Simple rate limiting
-    now = datetime.now()
-    minute_ago = now - timedelta(minutes=1)
-    
-    # Clean old entries
-    rate_limit_storage[credentials.credentials] = [
-        timestamp for timestamp in rate_limit_storage[credentials.credentials]
-        if timestamp > minute_ago
-    ]
-    
-    # Check rate limit
-    if len(rate_limit_storage[credentials.credentials]) >= RATE_LIMIT_REQUESTS:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
-    
-    # Record this request
-    rate_limit_storage[credentials.credentials].append(now)
+    # Constant work per request, whatever the request rate
+    allowed, retry_after = await rate_limiter.hit(credentials.credentials, request.url.path)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(int(retry_after))}
+        )
     
     return credentials.credentials
 
 
+# Conditional GET: clients revalidate with If-None-Match instead of cache-busting
+CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names `etag` (weak comparison, as RFC 9110 says)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+
+
 # ============================================================================
 # HAPPYROBOT-COMPATIBLE ENDPOINTS
 # ============================================================================
 
 @app.get("/api/v1/loads", response_model=HappyRobotResponse)
 async def get_loads(
+    request: Request,
     # REQUIRED: At least one origin parameter
     origin_city: Optional[str] = Query(None, description="Origin city (required: city OR state)"),
     origin_state: Optional[str] = Query(None, description="Origin state (required: city OR state)"),
@@ -179,6 +314,9 @@ async def get_loads(
     - Notes for the voice agent to use
     
     Loads are sorted by rate (highest first) to present best opportunities.
+    
+    Responses carry an ETag; send it back in If-None-Match to get a 304
+    while the board and its bookings are unchanged.
     """
     
     # If no parameters provided, return all loads
@@ -190,138 +328,31 @@ async def get_loads(
                 f"include_booked={include_booked}")
     
     try:
-        # Search loads
-        if include_booked:
-            # Special case for dashboard - get ALL loads regardless of booking status
-            results = await app.state.loads.search(
-                origin_city=origin_city,
-                origin_state=origin_state,
-                destination_city=destination_city,
-                destination_state=destination_state,
-                equipment_type=equipment_type,
-                pickup_date=pickup_date,
-                max_results=100,  # Get more loads when including booked
-                include_booked=True
-            )
-        else:
-            # Normal search - exclude booked loads (for HappyRobot)
-            results = await app.state.loads.search(
-                origin_city=origin_city,
-                origin_state=origin_state,
-                destination_city=destination_city,
-                destination_state=destination_state,
-                equipment_type=equipment_type,
-                pickup_date=pickup_date,
-                max_results=10
-            )
+        # Taken before searching, so a booking that lands mid-search can
+        # only make the ETag stale, never the body
+        etag = await app.state.loads.etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        # Format for HappyRobot - SIMPLIFIED FLAT STRUCTURE
-        formatted_loads = []
-        for load in results:
-            # Parse origin
-            origin_parts = load["origin"].split(",")
-            origin_city_parsed = origin_parts[0].strip() if len(origin_parts) > 0 else ""
-            origin_state_parsed = origin_parts[1].strip() if len(origin_parts) > 1 else ""
-            
-            # Parse destination
-            dest_parts = load["destination"].split(",")
-            dest_city_parsed = dest_parts[0].strip() if len(dest_parts) > 0 else ""
-            dest_state_parsed = dest_parts[1].strip() if len(dest_parts) > 1 else ""
-            
-            # Calculate rate per mile
-            rate_per_mile = round(load["loadboard_rate"] / load["miles"], 2) if load["miles"] > 0 else 0
-            
-            # SIMPLE FLAT STRUCTURE
-            formatted_loads.append({
-                # Identifiers
-                "reference_number": load["load_id"],
-                "load_id": load["load_id"],
-                
-                # Contact
-                "contact": {
-                    "name": "Dispatch",
-                    "email": "dispatch@acmelogistics.com",
-                    "phone": "18005551234",
-                    "extension": "",
-                    "type": "dispatch"
-                },
-                
-                # Type and status
-                "type": "can_get",
-                "status": "booked" if load.get("is_booked", False) else "available",
-                "is_partial": False,
-                
-                # Stops (required by HappyRobot)
-                "stops": [
-                    {
-                        "type": "origin",
-                        "location": {
-                            "city": origin_city_parsed,
-                            "state": origin_state_parsed,
-                            "zip": "",
-                            "country": "US"
-                        },
-                        "stop_timestamp_open": load["pickup_datetime"],
-                        "stop_timestamp_close": load["pickup_datetime"]
-                    },
-                    {
-                        "type": "destination",
-                        "location": {
-                            "city": dest_city_parsed,
-                            "state": dest_state_parsed,
-                            "zip": "",
-                            "country": "US"
-                        },
-                        "stop_timestamp_open": load["delivery_datetime"],
-                        "stop_timestamp_close": load["delivery_datetime"]
-                    }
-                ],
-                
-                # Route info (flat)
-                "origin": load["origin"],
-                "destination": load["destination"],
-                "miles": load["miles"],
-                
-                # Equipment and cargo (flat)
-                "equipment_type": load["equipment_type"],
-                "weight": load["weight"],
-                "number_of_pieces": load["num_of_pieces"],
-                "commodity_type": load["commodity_type"],
-                "dimensions": load.get("dimensions", ""),
-                
-                # Pricing (flat)
-                "posted_carrier_rate": load["loadboard_rate"],
-                "max_buy": round(load["loadboard_rate"] * 1.05, 2),
-                "rate_per_mile": rate_per_mile,
-                
-                # Schedule (flat)
-                "pickup_datetime": load["pickup_datetime"],
-                "delivery_datetime": load["delivery_datetime"],
-                "pickup_date": load["pickup_datetime"].split("T")[0],
-                "delivery_date": load["delivery_datetime"].split("T")[0],
-                
-                # Notes
-                "notes": app.state.loads.generate_load_notes(load),
-                "sale_notes": load.get("notes", ""),
-                
-                # Metadata
-                "branch": "Main",
-                "bridge": {
-                    "status": "success",
-                    "bridge_load_id": f"BRK-{load['load_id']}"
-                }
-            })
+        # Search loads - each load's JSON is pre-encoded, we just splice it into
+        # the envelope and skip response_model re-validation
+        content = await app.state.loads.search_json(
+            origin_city=origin_city,
+            origin_state=origin_state,
+            destination_city=destination_city,
+            destination_state=destination_state,
+            equipment_type=equipment_type,
+            pickup_date=pickup_date,
+            # Dashboard gets ALL loads regardless of booking status; HappyRobot only available ones
+            max_results=100 if include_booked else 10,
+            include_booked=include_booked
+        )
         
-        logger.info(f"✅ Found {len(formatted_loads)} matching loads")
+        logger.info(f"✅ Load search returned {len(content)} bytes")
         
         # HappyRobot expects this format
-        return {
-            "statusCode": 200,
-            "body": {
-                "loads": formatted_loads
-            }
-        }
-        
+        return Response(content=content, media_type="application/json", headers={"ETag": etag, **CACHE_HEADERS})
+    
     except Exception as e:
         logger.error(f"❌ Load search error: {e}")
         return {
@@ -332,6 +363,38 @@ async def get_loads(
         }
 
 
+def format_carrier(result: dict, mc: Optional[str], dot: Optional[str]) -> dict:
+    """Shape an FMCSAService result as a HappyRobot carrier record"""
+    return {
+        "carrier_id": f"CAR-{mc or dot}",
+        "carrier_name": result["carrier_name"],
+        "mc_number": result.get("mc_number", mc or ""),
+        "dot_number": result.get("dot_number", dot or ""),
+        "eligible": result["eligible"],
+        "status": "active" if result["status_code"] == "A" else "inactive",
+        "status_code": result["status_code"],
+        "status_description": result.get("status_description", ""),
+        "allowed_to_operate": result["allowed_to_operate"],
+        "out_of_service": result["out_of_service"],
+        "carrier_operation": result.get("carrier_operation", ""),
+        "city": result.get("city", ""),
+        "state": result.get("state", ""),
+        "address": result.get("address", ""),
+        "zip_code": result.get("zip_code", ""),
+        "phone": result.get("phone", ""),
+        "insurance_on_file": result.get("insurance_on_file", 0),
+        "insurance_required": result.get("insurance_required", 0),
+        "message": result["message"],
+        "notes": result["message"],  # Duplicate message in notes field for easier parsing
+        "stale": result.get("stale", False),  # Last known verdict served because FMCSA was unavailable
+        "contacts": [],  # We don't have contact info from FMCSA
+        "bridge": {
+            "status": "success",
+            "bridge_carrier_id": f"BRK-{mc or dot}"
+        }
+    }
+
+
 @app.get("/api/v1/carriers/find", response_model=HappyRobotResponse)
 async def get_carrier(
     mc: Optional[str] = Query(None, description="Motor Carrier (MC) number"),
@@ -361,14 +424,9 @@ async def get_carrier(
         }
     
     try:
-        # Get environment variables
-        fmcsa_api_key = os.getenv("FMCSA_API_KEY")
-        fmcsa_base_url = os.getenv(
-            "FMCSA_BASE_URL",
-            "https://mobile.fmcsa.dot.gov/qc/services"
-        )
+        fmcsa_service = app.state.fmcsa
         
-        if not fmcsa_api_key:
+        if not fmcsa_service.api_key:
             return {
                 "statusCode": 500,
                 "body": {
@@ -376,16 +434,8 @@ async def get_carrier(
                 }
             }
         
-        # Create FMCSA service and verify
-        fmcsa_service = FMCSAService(
-            app.state.http_client,
-            fmcsa_api_key,
-            fmcsa_base_url
-        )
-        
         # Use MC number if provided, otherwise DOT
-        lookup_number = mc or dot
-        result = await fmcsa_service.verify_carrier(lookup_number)
+        result = await fmcsa_service.verify_carrier(mc or dot, kind="mc" if mc else "dot")
         
         # Log verification attempt if not eligible
         if not result["eligible"]:
@@ -406,33 +456,7 @@ async def get_carrier(
             logger.info(f"✅ Carrier found and eligible: {result['carrier_name']}")
         
         # Always format and return carrier information
-        carrier_response = {
-            "carrier_id": f"CAR-{mc or dot}",
-            "carrier_name": result["carrier_name"],
-            "mc_number": result.get("mc_number", mc or ""),
-            "dot_number": result.get("dot_number", dot or ""),
-            "eligible": result["eligible"],
-            "status": "active" if result["status_code"] == "A" else "inactive",
-            "status_code": result["status_code"],
-            "status_description": result.get("status_description", ""),
-            "allowed_to_operate": result["allowed_to_operate"],
-            "out_of_service": result["out_of_service"],
-            "carrier_operation": result.get("carrier_operation", ""),
-            "city": result.get("city", ""),
-            "state": result.get("state", ""),
-            "address": result.get("address", ""),
-            "zip_code": result.get("zip_code", ""),
-            "phone": result.get("phone", ""),
-            "insurance_on_file": result.get("insurance_on_file", 0),
-            "insurance_required": result.get("insurance_required", 0),
-            "message": result["message"],
-            "notes": result["message"],  # Duplicate message in notes field for easier parsing
-            "contacts": [],  # We don't have contact info from FMCSA
-            "bridge": {
-                "status": "success",
-                "bridge_carrier_id": f"BRK-{mc or dot}"
-            }
-        }
+        carrier_response = format_carrier(result, mc, dot)
         
         # Always return 200 with carrier information
         return {
@@ -441,7 +465,7 @@ async def get_carrier(
                 "carrier": carrier_response
             }
         }
-        
+    
     except Exception as e:
         logger.error(f"❌ Carrier lookup error: {e}")
         return {
@@ -452,6 +476,49 @@ async def get_carrier(
         }
 
 
+@app.post("/api/v1/carriers/batch")
+async def verify_carriers_batch(
+    request: CarrierBatchRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Pre-qualify a list of carriers in one request
+    
+    Duplicates are ignored and cached verdicts come back first. The rest
+    are verified against FMCSA with bounded concurrency
+    (FMCSA_BATCH_CONCURRENCY). Results stream back as NDJSON, one line per
+    carrier, as each lookup completes:
+        
+        {"lookup": "123456", "kind": "mc", "cached": false, "carrier": {...}}
+    """
+    fmcsa_service = app.state.fmcsa
+    if not fmcsa_service.api_key:
+        raise HTTPException(status_code=500, detail="FMCSA API key not configured")
+    
+    # MC and DOT numbers are different namespaces - each is looked up (and cached) by its kind
+    lookups = list(dict.fromkeys(
+        [("mc", number.strip()) for number in request.mc_numbers] +
+        [("dot", number.strip()) for number in request.dot_numbers]
+    ))
+    
+    logger.info(f"📞 Batch carrier lookup: {len(lookups)} unique carriers")
+    concurrency = int(os.getenv("FMCSA_BATCH_CONCURRENCY", 8))
+    
+    async def stream_results():
+        async for kind, number, result, cached in fmcsa_service.verify_many(lookups, concurrency=concurrency):
+            mc = number if kind == "mc" else None
+            dot = number if kind == "dot" else None
+            line = {
+                "lookup": number,
+                "kind": kind,
+                "cached": cached,
+                "carrier": format_carrier(result, mc, dot)
+            }
+            yield json.dumps(line) + "\n"
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
 @app.post("/api/v1/offers/log", response_model=HappyRobotResponse)
 async def log_offer(
     request: OfferLogRequest = Body(..., 
@@ -512,9 +579,10 @@ async def log_offer(
                     }
                 )
         
-        # Check if load is already booked
-        if request.load_id and request.outcome == "booked":
-            if not app.state.loads.is_load_available(request.load_id):
+        # Compare-and-book before logging anything: of any number of concurrent
+        # bookings for a load (in any worker), exactly one wins, the rest get a 409
+        if request.load_id and request.outcome == CallOutcome.booked:
+            if not await app.state.loads.mark_as_booked(request.load_id):
                 logger.warning(f"⚠️ Attempt to book already booked load: {request.load_id}")
                 # Log the failed attempt
                 await app.state.metrics.log_call(
@@ -538,23 +606,37 @@ async def log_offer(
                 )
         
         # Log the offer as a call with enhanced data
+        booking = bool(request.load_id) and request.outcome == CallOutcome.booked
         call_id = f"call_{request.load_id}_{request.mc_number}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        await app.state.metrics.log_call(
-            call_id=call_id,
-            mc_number=request.mc_number,
-            carrier_name=request.carrier_name,
-            load_id=request.load_id,
-            outcome=request.outcome.value,
-            sentiment=request.sentiment.value,
-            agreed_rate=request.carrier_offer if request.outcome == CallOutcome.booked else None,
-            negotiation_rounds=request.negotiation_rounds,
-            call_duration_seconds=request.call_duration,
-            notes=request.notes
-        )
+        try:
+            await app.state.metrics.log_call(
+                call_id=call_id,
+                mc_number=request.mc_number,
+                carrier_name=request.carrier_name,
+                load_id=request.load_id,
+                outcome=request.outcome.value,
+                sentiment=request.sentiment.value,
+                agreed_rate=request.carrier_offer if request.outcome == CallOutcome.booked else None,
+                negotiation_rounds=request.negotiation_rounds,
+                call_duration_seconds=request.call_duration,
+                notes=request.notes,
+                durable=booking
+            )
+            if booking:
+                # Don't confirm a booking that isn't on disk yet
+                await app.state.loads.flush_bookings(request.load_id)
+        except Exception as e:
+            if not booking:
+                raise
+            logger.error(f"❌ Booking of load {request.load_id} not persisted: {e}")
+            # Nothing was confirmed, so don't leave the load booked for good
+            try:
+                await app.state.loads.unbook(request.load_id)
+            except Exception as e:
+                logger.error(f"❌ Could not release load {request.load_id}: {e}")
+            raise HTTPException(status_code=503, detail=f"Booking of load {request.load_id} could not be saved")
         
-        # If the outcome is "booked", mark the load as unavailable
-        if request.outcome == CallOutcome.booked and request.load_id:
-            app.state.loads.mark_as_booked(request.load_id)
+        if booking:
             logger.info(f"✅ Load {request.load_id} marked as booked")
         
         logger.info(f"✅ Call logged: {request.outcome.value} - MC {request.mc_number}")
@@ -567,7 +649,9 @@ async def log_offer(
                 "call_id": call_id
             }
         )
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Offer logging error: {e}")
         return HappyRobotResponse(
@@ -585,7 +669,7 @@ async def log_offer(
 # Mount dashboard static files
 dashboard_path = os.path.join(os.path.dirname(__file__), "..", "dashboard")
 if os.path.exists(dashboard_path):
-    app.mount("/static", StaticFiles(directory=dashboard_path), name="static")
+    app.mount("/static", PrecompressedStaticFiles(directory=dashboard_path), name="static")
 
 @app.get("/dashboard")
 async def dashboard():
@@ -616,9 +700,14 @@ async def healthcheck():
     """Detailed health check"""
     return {
         "status": "healthy",
-        "loads_available": len(app.state.loads.loads),
+        "loads_available": await app.state.loads.count(),
         "loads_booked": len(app.state.loads.booked_loads),
         "booked_load_ids": list(app.state.loads.booked_loads),
+        "fmcsa_stats": app.state.fmcsa.stats(),
+        "rate_limiter": await rate_limiter.stats(),
+        "state_backend": type(state_backend).__name__,
+        "storage_backend": "sqlite" if storage is not None else "json",
+        "events": app.state.events.stats(),
         "services": {
             "fmcsa": "operational",
             "loads": "operational",
@@ -628,25 +717,122 @@ async def healthcheck():
 
 
 @app.get("/metrics")
-async def get_metrics(api_key: str = Depends(verify_api_key)):
-    """Get dashboard metrics"""
+async def get_metrics(request: Request, api_key: str = Depends(verify_api_key)):
+    """Get dashboard metrics (304 while If-None-Match names the current ETag)"""
     try:
+        etag = await app.state.metrics.etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
         metrics = await app.state.metrics.get_metrics()
-        return metrics
+        return JSONResponse(metrics, headers={"ETag": etag, **CACHE_HEADERS})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics/calls")
+async def get_call_history(
+    limit: int = Query(50, ge=1, le=500, description="Calls per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    api_key: str = Depends(verify_api_key)
+):
+    """Full call history, most recent first, one page at a time"""
+    try:
+        return await app.state.metrics.get_call_history(limit=limit, cursor=cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/metrics/calls/since")
+async def get_calls_since(
+    seq: int = Query(0, ge=0, description="last_seq from the previous pull (0 for everything)"),
+    limit: int = Query(500, ge=1, le=1000, description="Calls per pull"),
+    api_key: str = Depends(verify_api_key)
+):
+    """Calls logged after a sequence number, oldest first - for clients keeping a local mirror"""
+    try:
+        return await app.state.metrics.get_calls_since(seq=seq, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Default span of /metrics/rollups when no start is given
+ROLLUP_SPANS = {"hour": timedelta(hours=24), "day": timedelta(days=30)}
+
+
+def local_time(value: datetime) -> datetime:
+    """Call timestamps are naive server-local time - compare in that"""
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+@app.get("/metrics/rollups")
+async def get_rollups(
+    granularity: str = Query("hour", pattern="^(hour|day)$", description="Bucket size: hour or day"),
+    start: Optional[datetime] = Query(None, description="ISO 8601 start (default: 24 hours / 30 days before end)"),
+    end: Optional[datetime] = Query(None, description="ISO 8601 end (default: now)"),
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    Call totals per hour or day over a time range, for trend charts
+    
+    Each bucket has calls, bookings, booked_value, negotiation_rounds,
+    booked_rounds, call_duration_seconds, timed_calls and outcome /
+    sentiment counts. Buckets without calls are left out.
+    """
+    end = local_time(end) if end else datetime.now()
+    start = local_time(start) if start else end - ROLLUP_SPANS[granularity]
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    try:
+        return await app.state.metrics.get_rollups(granularity, start.isoformat(), end.isoformat())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/events")
+async def stream_events(request: Request, api_key: str = Depends(verify_api_key)):
+    """
+    Server-Sent Events for the dashboard: small deltas instead of polling
+    
+    Events: `call` (a logged call), `booking` ({load_id}), `metrics` (the
+    get_metrics counters, at most once a second), `calls_cleared`,
+    `bookings_cleared`, and `resync` (events were missed - refetch).
+    Send Last-Event-ID on reconnect to resume where the stream left off.
+    """
+    events = app.state.events
+    queue = events.subscribe(request.headers.get("last-event-id"))
+    keepalive = float(os.getenv("EVENTS_KEEPALIVE", 15.0))
+    
+    async def stream():
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"  # keeps proxies from closing an idle stream
+                    continue
+                if frame is None:
+                    break  # shutting down
+                yield frame
+        finally:
+            events.unsubscribe(queue)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/metrics/reset")
 async def reset_metrics(api_key: str = Depends(verify_api_key)):
     """Reset all metrics data (useful for demos)"""
     try:
         # Clear the metrics
-        app.state.metrics.calls = []
-        await app.state.metrics.save()
+        await app.state.metrics.reset()
         
         # Also clear booked loads tracking
-        app.state.loads.booked_loads.clear()
+        await app.state.loads.clear_bookings()
         
         logger.info("🧹 Metrics and booking data reset")
         
@@ -677,7 +863,8 @@ async def http_exception_handler(request, exc):
         content={
             "error": exc.detail,
             "status_code": exc.status_code
-        }
+        },
+        headers=getattr(exc, "headers", None)
     )
 
 
@@ -705,11 +892,22 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
     
+    workers = int(os.getenv("WORKERS", 1))
+    
     logger.info(f"🚀 Starting server on {host}:{port}")
     
+    if workers > 1 and not state_backend.shared:
+        logger.warning("WORKERS > 1 with STATE_BACKEND=memory - bookings and rate limits won't be shared")
+    
     uvicorn.run(
-        app,
+        # Extra workers import the app themselves, so they need it by name
+        "main:app" if workers > 1 else app,
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        workers=workers,
         host=host,
         port=port,
-        reload=False
+        reload=False,
+        # Open /events streams never finish on their own - cut them off after
+        # this long so shutdown (and the metrics flush) runs within Fly's kill_timeout
+        timeout_graceful_shutdown=float(os.getenv("SHUTDOWN_GRACE", 3.0))
     )
\ No newline at end of file
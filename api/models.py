@@ -12,6 +12,12 @@ class CarrierVerifyRequest(BaseModel):
     mc_number: str = Field(..., description="Motor Carrier number")
 
 
+class CarrierBatchRequest(BaseModel):
+    """Batch carrier pre-qualification (duplicates are ignored)"""
+    mc_numbers: List[str] = Field(default_factory=list, max_length=1000, description="Motor Carrier numbers")
+    dot_numbers: List[str] = Field(default_factory=list, max_length=1000, description="DOT numbers")
+
+
 class CarrierVerifyResponse(BaseModel):
     eligible: bool
     carrier_name: str
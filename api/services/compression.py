@@ -0,0 +1,231 @@
+import gzip
+import mimetypes
+import os
+import stat
+from typing import List, Optional, Sequence, Tuple
+import logging
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .io_executor import run_blocking
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Our preference when the client likes several equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "text/", "image/svg+xml")
+STREAMING_TYPES = ("text/event-stream", "application/x-ndjson")  # each chunk must go out as it's written
+
+
+def accepted_encodings(accept_encoding: str, available: Sequence[str] = ENCODINGS) -> List[str]:
+    """The `available` encodings an Accept-Encoding header allows, best first"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding] = q
+    
+    default = weights.get("*", 0.0)
+    ranked = [(weights.get(coding, default), -i, coding) for i, coding in enumerate(available)]
+    return [coding for q, _, coding in sorted(ranked, reverse=True) if q > 0]
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, mode=brotli.MODE_TEXT, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+def guess_type(path: str) -> str:
+    media_type, _ = mimetypes.guess_type(path)
+    return media_type or "application/octet-stream"
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(STREAMING_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Negotiated br/gzip compression for responses of known size
+    
+    Only bodies of at least `minimum_size` bytes are compressed - below
+    that the headers outweigh the savings. The size comes from
+    Content-Length, so streams (SSE, NDJSON) pass straight through and
+    a response is only buffered when it will be compressed. Bodies over
+    `offload_size` are compressed on the I/O pool instead of the event loop.
+    
+    A strong ETag on a compressed response is made weak: the bytes differ
+    from the identity encoding, and If-None-Match uses weak comparison anyway.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        offload_size: int = 256 * 1024
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.offload_size = offload_size
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if not encodings:
+            await self.app(scope, receive, send)
+            return
+        encoding = encodings[0]
+        
+        start: Optional[Message] = None
+        chunks: List[bytes] = []
+        
+        async def send_compressed(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                if self._should_compress(message):
+                    start = message  # hold the headers until the body is in
+                    return
+                await send(message)
+                return
+            if start is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if len(body) > self.offload_size:
+                body = await run_blocking(compress, body, encoding, self.gzip_level, self.brotli_quality)
+            else:
+                body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+        
+        await self.app(scope, receive, send_compressed)
+    
+    def _should_compress(self, start: Message) -> bool:
+        if start["status"] < 200 or start["status"] in (204, 206, 304):
+            return False
+        headers = Headers(raw=start["headers"])
+        if "content-encoding" in headers or not is_compressible(headers.get("content-type", "")):
+            return False
+        try:
+            return int(headers.get("content-length", "")) >= self.minimum_size
+        except ValueError:
+            return False  # no length - a stream
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves `name.br` / `name.gz` in place of `name`
+    when the client accepts it and the compressed copy is up to date
+    
+    The copies are written by precompress_static, so serving a file
+    costs no compression at all.
+    """
+    
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        accept = Headers(scope=scope).get("accept-encoding", "")
+        if accept and scope["method"] in ("GET", "HEAD"):
+            encodings = accepted_encodings(accept, tuple(SUFFIXES))
+            variant = await anyio.to_thread.run_sync(self._lookup_variant, path, encodings)
+            if variant is not None:
+                encoding, full_path, stat_result = variant
+                response = self.file_response(full_path, stat_result, scope)
+                if response.status_code != 304:
+                    # Typed as the original file, not as a .gz/.br archive
+                    media_type = guess_type(path)
+                    if media_type.startswith("text/"):
+                        media_type += "; charset=utf-8"
+                    response.headers["Content-Type"] = media_type
+                    response.headers["Content-Encoding"] = encoding
+                response.headers.add_vary_header("Accept-Encoding")
+                return response
+        
+        response = await super().get_response(path, scope)
+        response.headers.add_vary_header("Accept-Encoding")
+        return response
+    
+    def _lookup_variant(self, path: str, encodings: List[str]) -> Optional[Tuple[str, str, os.stat_result]]:
+        """(encoding, path, stat) of the best up-to-date compressed copy of `path` (blocking)"""
+        _, original = self.lookup_path(path)
+        if original is None or not stat.S_ISREG(original.st_mode):
+            return None
+        for encoding in encodings:
+            full_path, compressed = self.lookup_path(path + SUFFIXES[encoding])
+            if compressed is not None and stat.S_ISREG(compressed.st_mode) and compressed.st_mtime >= original.st_mtime:
+                return encoding, full_path, compressed
+        return None
+
+
+def precompress_static(directory: str, gzip_level: int = 9, brotli_quality: int = 11) -> int:
+    """
+    Write .gz (and .br, with brotli installed) next to every compressible
+    file under `directory` that lacks an up-to-date copy (blocking)
+    
+    Done once at startup at the highest levels - the cost is paid once,
+    not per request. Returns how many copies were written.
+    """
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(tuple(SUFFIXES.values())) or not is_compressible(guess_type(name)):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                body = f.read()
+            mtime = os.stat(path).st_mtime
+            for encoding in ENCODINGS:
+                target = path + SUFFIXES[encoding]
+                if os.path.exists(target) and os.stat(target).st_mtime >= mtime:
+                    continue
+                compressed = compress(body, encoding, gzip_level, brotli_quality)
+                if len(compressed) >= len(body):
+                    continue
+                tmp_path = f"{target}.{os.getpid()}.tmp"  # workers precompress concurrently
+                try:
+                    with open(tmp_path, "wb") as f:
+                        f.write(compressed)
+                    os.replace(tmp_path, target)
+                except OSError:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                written += 1
+    return written
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EventBroker:
+    """
+    Fans dashboard events out to Server-Sent Events subscribers
+    
+    Services publish small deltas (a call was logged, a load was booked);
+    each subscriber gets its own bounded queue of ready-to-send SSE frames,
+    so a frame is encoded once however many dashboards are connected.
+    
+    Recent frames are kept so a reconnecting client can resume from its
+    Last-Event-ID. Event IDs carry a per-process epoch: a client that
+    missed more than the history holds, reconnected to another worker,
+    or fell so far behind that its queue overflowed gets a "resync" event
+    and refetches instead.
+    """
+    
+    def __init__(self, queue_size: int = 256, history: int = 256):
+        self.queue_size = queue_size
+        self.subscribers: Dict[asyncio.Queue, None] = {}
+        self._epoch = os.urandom(4).hex()
+        self._last_id = 0
+        self._history: Deque[Tuple[int, bytes]] = deque(maxlen=history)
+        self._debounced: Dict[str, asyncio.TimerHandle] = {}
+        self.published = 0
+        self.dropped = 0  # subscribers told to resync after overflowing
+    
+    def _frame(self, event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+        frame = f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+        if event_id is not None:
+            frame = f"id: {self._epoch}-{event_id}\n" + frame
+        return frame.encode("utf-8")
+    
+    def subscribe(self, last_event_id: Optional[str] = None) -> asyncio.Queue:
+        """A queue of SSE frames, starting with any the client missed since `last_event_id`"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if last_event_id:
+            epoch, _, seen = last_event_id.partition("-")
+            seen = int(seen) if seen.isdigit() else -1
+            oldest = self._history[0][0] if self._history else self._last_id + 1
+            missed = self._last_id - seen
+            if epoch != self._epoch or seen < oldest - 1 or not 0 <= missed <= self.queue_size:
+                queue.put_nowait(self._frame("resync", {}))
+            else:
+                for event_id, frame in self._history:
+                    if event_id > seen:
+                        queue.put_nowait(frame)
+        self.subscribers[queue] = None
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.pop(queue, None)
+    
+    def publish(self, event: str, data: Any):
+        """Send an event to every subscriber (never blocks)"""
+        self._last_id += 1
+        self.published += 1
+        if not self.subscribers:
+            self._history.clear()  # nobody to replay to - a reconnect resyncs
+            return
+        frame = self._frame(event, data, self._last_id)
+        self._history.append((self._last_id, frame))
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too far behind to catch up frame by frame - start it over
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._frame("resync", {}))
+                self.dropped += 1
+    
+    def publish_soon(self, event: str, produce: Callable[[], Awaitable[Any]], delay: float = 1.0):
+        """
+        Publish `await produce()` after `delay` seconds, at most once per delay
+        
+        For derived state (like metrics counters): a burst of changes costs
+        one recomputation, not one per change.
+        """
+        if event in self._debounced or not self.subscribers:
+            return
+        
+        async def run():
+            try:
+                self.publish(event, await produce())
+            except Exception as e:
+                logger.error(f"Failed to publish {event} event: {e}")
+        
+        def fire():
+            del self._debounced[event]
+            asyncio.ensure_future(run())
+        
+        self._debounced[event] = asyncio.get_running_loop().call_later(delay, fire)
+    
+    def close(self):
+        """End every open stream (on shutdown)"""
+        for handle in self._debounced.values():
+            handle.cancel()
+        self._debounced.clear()
+        for queue in list(self.subscribers):
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        self.subscribers.clear()
+    
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "dropped": self.dropped
+        }
@@ -1,21 +1,321 @@
+import asyncio
+import random
+import time
+from collections import deque
 import httpx
-from typing import Dict
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
 import logging
 
+from .cache import SingleFlight, TTLCache
+
 logger = logging.getLogger(__name__)
 
 
+class TransientFMCSAError(Exception):
+    """A retryable FMCSA failure (5xx or 429)"""
+    
+    def __init__(self, status_code: int):
+        super().__init__(f"FMCSA returned {status_code}")
+        self.status_code = status_code
+
+
 class FMCSAService:
     """Service for verifying carriers via FMCSA API"""
     
-    def __init__(self, http_client: httpx.AsyncClient, api_key: str, base_url: str):
+    # Lookup path per number kind - MC numbers are dockets, DOT numbers are the carrier's own ID
+    ENDPOINTS = {
+        "mc": "/carriers/docket-number/{}",
+        "dot": "/carriers/{}",
+    }
+    
+    # Default cache lifetimes (seconds) per verdict. Errors are never cached.
+    CACHE_TTLS = {
+        "eligible": 6 * 60 * 60,
+        "not_eligible": 60 * 60,
+        "not_found": 15 * 60,
+    }
+    
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        api_key: Optional[str],
+        base_url: str,
+        cache: Optional[TTLCache] = None,
+        cache_ttls: Optional[Dict[str, float]] = None,
+        single_flight: Optional[SingleFlight] = None,
+        deadline: Optional[float] = None,
+        max_retries: int = 0,
+        retry_backoff: float = 0.2,
+        hedge: bool = False,
+        hedge_delay: float = 1.0
+    ):
         self.http_client = http_client
         self.api_key = api_key
         self.base_url = base_url
+        self.cache = cache
+        self.cache_ttls = {**self.CACHE_TTLS, **(cache_ttls or {})}
+        self.single_flight = single_flight
+        self.requests_sent = 0
+        self.requests_in_flight = 0
+        
+        # Latency budget: total seconds a lookup may take, retries included
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        # Hedging: fire a second request if the first is slower than our p95
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay  # used until we have enough latency samples
+        self._latencies = deque(maxlen=200)
+        self.retries = 0
+        self.hedged = 0
+        self.budget_exceeded = 0
     
-    async def verify_carrier(self, mc_number: str) -> Dict:
+    @staticmethod
+    def create_client(
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        http2: bool = False
+    ) -> httpx.AsyncClient:
+        """
+        Build the long-lived HTTP client used for every FMCSA call
+        
+        Warm keep-alive connections are reused across lookups. HTTP/2 needs
+        the optional `h2` package (pip install httpx[http2]); without it we
+        fall back to HTTP/1.1.
         """
-        Verify a carrier using their MC number
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("FMCSA HTTP/2 requested but h2 is not installed - using HTTP/1.1")
+                http2 = False
+        
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            timeout=httpx.Timeout(
+                connect=connect_timeout,
+                read=read_timeout,
+                write=read_timeout,
+                pool=connect_timeout
+            )
+        )
+    
+    async def aclose(self):
+        await self.http_client.aclose()
+    
+    def pool_stats(self) -> Dict:
+        """Connection pool utilization (reads httpcore internals, best effort)"""
+        stats = {
+            "requests_sent": self.requests_sent,
+            "requests_in_flight": self.requests_in_flight
+        }
+        try:
+            pool = self.http_client._transport._pool
+            connections = list(pool.connections)
+            idle = sum(1 for connection in connections if connection.is_idle())
+            stats.update({
+                "connections": len(connections),
+                "active": len(connections) - idle,
+                "idle": idle,
+                "max_connections": pool._max_connections
+            })
+        except AttributeError:
+            pass
+        return stats
+    
+    def stats(self) -> Dict:
+        """Cache, request coalescing and connection pool counters"""
+        return {
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "single_flight": self.single_flight.stats() if self.single_flight is not None else None,
+            "pool": self.pool_stats(),
+            "latency": {
+                "p95_seconds": round(self._p95(), 3) if self._latencies else None,
+                "retries": self.retries,
+                "hedged": self.hedged,
+                "budget_exceeded": self.budget_exceeded
+            }
+        }
+    
+    @staticmethod
+    def _verdict(result: Dict) -> Optional[str]:
+        """Classify a lookup result for caching (None = don't cache)"""
+        if result["status_code"] == "ERROR":
+            return None
+        if result["eligible"]:
+            return "eligible"
+        if result["status_code"] == "N/A":
+            return "not_found"
+        return "not_eligible"
+    
+    async def verify_carrier(self, number: str, kind: str = "mc") -> Dict:
+        """
+        Verify a carrier by MC (kind="mc") or DOT (kind="dot") number,
+        serving repeat lookups from cache
+        
+        Concurrent lookups for the same carrier share a single upstream
+        request. See _lookup_carrier for the shape of the result.
+        """
+        key = self._cache_key(number, kind)
+        cached = self._cached(key)
+        if cached is not None:
+            logger.info(f"FMCSA cache hit for {kind.upper()} {number}")
+            return cached
+        return await self._verify_uncached(key, number, kind)
+    
+    async def verify_many(
+        self,
+        lookups: Iterable[Tuple[str, str]],
+        concurrency: int = 8
+    ) -> AsyncIterator[Tuple[str, str, Dict, bool]]:
+        """
+        Verify many (kind, number) carriers, yielding (kind, number, result, cached) as each completes
+        
+        Duplicates are dropped, cache hits are yielded straight away and the
+        misses fan out to FMCSA with at most `concurrency` lookups in flight.
+        """
+        unique = list(dict.fromkeys(
+            (kind, str(number).strip()) for kind, number in lookups if str(number).strip()
+        ))
+        
+        misses = []
+        for kind, number in unique:
+            cached = self._cached(self._cache_key(number, kind))
+            if cached is not None:
+                yield kind, number, cached, True
+            else:
+                misses.append((kind, number))
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def verify(kind: str, number: str) -> Tuple[str, str, Dict]:
+            async with semaphore:
+                return kind, number, await self._verify_uncached(self._cache_key(number, kind), number, kind)
+        
+        tasks = [asyncio.ensure_future(verify(kind, number)) for kind, number in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                kind, number, result = await next_done
+                yield kind, number, result, False
+        finally:
+            # Client went away mid-stream - stop the remaining lookups
+            for task in tasks:
+                task.cancel()
+    
+    @staticmethod
+    def _cache_key(number: str, kind: str = "mc") -> str:
+        return f"{kind}:{str(number).strip()}"
+    
+    def _cached(self, key: str) -> Optional[Dict]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        return dict(cached) if cached is not None else None
+    
+    async def _verify_uncached(self, key: str, number: str, kind: str = "mc") -> Dict:
+        if self.single_flight is not None:
+            result = await self.single_flight.do(key, lambda: self._lookup_and_cache(key, number, kind))
+        else:
+            result = await self._lookup_and_cache(key, number, kind)
+        
+        # Every waiter gets its own copy of the shared result
+        return dict(result)
+    
+    async def _lookup_and_cache(self, key: str, number: str, kind: str = "mc") -> Dict:
+        result = await self._lookup_carrier(number, kind)
+        
+        verdict = self._verdict(result)
+        if self.cache is not None and verdict is not None:
+            self.cache.set(key, dict(result), self.cache_ttls[verdict])
+        
+        if verdict is None and self.cache is not None:
+            # FMCSA failed or blew the budget - the last verdict beats no verdict
+            stale = self.cache.get_stale(key)
+            if stale is not None:
+                logger.warning(f"Serving stale FMCSA verdict for {kind.upper()} {number}: {result['message']}")
+                return {**stale, "stale": True}
+        
+        return result
+    
+    def _p95(self) -> float:
+        samples = sorted(self._latencies)
+        return samples[int(0.95 * (len(samples) - 1))]
+    
+    def _current_hedge_delay(self) -> float:
+        if len(self._latencies) < 20:
+            return self.hedge_delay
+        return max(0.05, self._p95())
+    
+    async def _fetch(self, number: str, kind: str = "mc") -> httpx.Response:
+        """One FMCSA request; raises TransientFMCSAError on 5xx/429"""
+        url = self.base_url + self.ENDPOINTS[kind].format(number)
+        params = {"webKey": self.api_key}
+        
+        self.requests_sent += 1
+        self.requests_in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await self.http_client.get(url, params=params)
+        finally:
+            self.requests_in_flight -= 1
+        
+        if response.status_code >= 500 or response.status_code == 429:
+            raise TransientFMCSAError(response.status_code)
+        
+        self._latencies.append(time.monotonic() - started)
+        return response
+    
+    async def _fetch_hedged(self, number: str, kind: str = "mc") -> httpx.Response:
+        """Fetch, racing a second request if the first is slower than usual"""
+        if not self.hedge:
+            return await self._fetch(number, kind)
+        
+        first = asyncio.ensure_future(self._fetch(number, kind))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self._current_hedge_delay())
+            if not done:
+                self.hedged += 1
+                logger.info(f"Hedging slow FMCSA request for {kind.upper()} {number}")
+                pending.add(asyncio.ensure_future(self._fetch(number, kind)))
+            
+            error = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _fetch_with_retries(self, number: str, kind: str = "mc") -> httpx.Response:
+        """Retry transient failures with jittered exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._fetch_hedged(number, kind)
+            except (TransientFMCSAError, httpx.TransportError) as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"FMCSA attempt {attempt + 1} for {kind.upper()} {number} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+    
+    async def _lookup_carrier(self, number: str, kind: str = "mc") -> Dict:
+        """
+        Look a carrier up in the FMCSA API by MC (or, with kind="dot", DOT) number
         
         Returns dict with:
         - eligible: bool (True if carrier can haul loads)
@@ -25,20 +325,20 @@ class FMCSAService:
         - out_of_service: str ("Y" = out of service, "N" = in service)
         - message: str
         """
+        label = f"{kind.upper()} {number}"
         
         try:
-            # FMCSA API endpoint
-            url = f"{self.base_url}/carriers/docket-number/{mc_number}"
-            params = {"webKey": self.api_key}
+            logger.info(f"Calling FMCSA API for {label}")
             
-            logger.info(f"Calling FMCSA API for MC {mc_number}")
-            
-            response = await self.http_client.get(url, params=params)
+            if self.deadline:
+                response = await asyncio.wait_for(self._fetch_with_retries(number, kind), self.deadline)
+            else:
+                response = await self._fetch_with_retries(number, kind)
             
             # Handle HTTP errors
             if response.status_code == 404:
-                logger.warning(f"MC {mc_number} not found in FMCSA database")
-                return self._not_found_response(mc_number)
+                logger.warning(f"{label} not found in FMCSA database")
+                return self._not_found_response(number, kind)
             
             if response.status_code != 200:
                 logger.error(f"FMCSA API error {response.status_code}")
@@ -47,10 +347,13 @@ class FMCSAService:
             # Parse response
             data = response.json()
             
-            # Validate response structure
-            if not data.get("content") or not isinstance(data["content"], list):
-                logger.warning(f"Invalid response structure for MC {mc_number}")
-                return self._not_found_response(mc_number)
+            # Validate response structure (the DOT endpoint returns a single record, not a list)
+            content = data.get("content")
+            if isinstance(content, dict):
+                data["content"] = content = [content]
+            if not content or not isinstance(content, list):
+                logger.warning(f"Invalid response structure for {label}")
+                return self._not_found_response(number, kind)
             
             # Get carrier data (content is a list)
             carrier_data = data["content"][0]
@@ -113,7 +416,7 @@ class FMCSAService:
                 message = f"Carrier is not eligible: {', '.join(reasons)}"
             
             logger.info(
-                f"MC {mc_number}: {carrier_name} - "
+                f"{label}: {carrier_name} - "
                 f"Eligible={eligible}, Allowed={allowed_to_operate}, "
                 f"Status={status_code}, OOS={out_of_service}"
             )
@@ -122,8 +425,8 @@ class FMCSAService:
             return {
                 "eligible": eligible,
                 "carrier_name": carrier_name,
-                "mc_number": mc_number,
-                "dot_number": str(carrier.get("dotNumber", "")),
+                "mc_number": number if kind == "mc" else "",
+                "dot_number": str(carrier.get("dotNumber", "") or (number if kind == "dot" else "")),
                 "allowed_to_operate": allowed_to_operate,
                 "status_code": status_code,
                 "status_description": "Active" if status_code == "A" else "Inactive" if status_code == "I" else "Unknown",
@@ -138,7 +441,14 @@ class FMCSAService:
                 "phone": carrier.get("telephone", ""),
                 "message": message
             }
-            
+        
+        except asyncio.TimeoutError:
+            self.budget_exceeded += 1
+            logger.error(f"FMCSA lookup for {label} exceeded {self.deadline}s budget")
+            return self._error_response(f"no response within {self.deadline}s")
+        except TransientFMCSAError as e:
+            logger.error(f"FMCSA API error {e.status_code}")
+            return self._error_response(e.status_code)
         except httpx.HTTPError as e:
             logger.error(f"HTTP error calling FMCSA API: {e}")
             return self._error_response(str(e))
@@ -147,7 +457,7 @@ class FMCSAService:
             logger.exception("Full traceback:")
             return self._error_response(str(e))
     
-    def _not_found_response(self, mc_number: str) -> Dict:
+    def _not_found_response(self, number: str, kind: str = "mc") -> Dict:
         """Standard response for carrier not found"""
         return {
             "eligible": False,
@@ -160,8 +470,8 @@ class FMCSAService:
             "carrier_operation": "",
             "city": "",
             "state": "",
-            "dot_number": "",
-            "message": f"Carrier MC {mc_number} not found in FMCSA database"
+            "dot_number": number if kind == "dot" else "",
+            "message": f"Carrier {kind.upper()} {number} not found in FMCSA database"
         }
     
     def _error_response(self, error: str) -> Dict:
@@ -0,0 +1,43 @@
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+import logging
+
+logger = logging.getLogger(__name__)
+
+# One-off blocking reads (loading data files) run here, apart from the
+# loop's default executor, so a slow disk can't starve anything else
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="acme-io")
+
+
+async def run_blocking(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call on the I/O pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, functools.partial(fn, *args, **kwargs))
+
+
+class SerialExecutor:
+    """
+    A dedicated thread for one service's file I/O, run in submission order
+    
+    Ordering is the point: appends, snapshots and log rotation queued from
+    the event loop reach the disk in the order they were queued, and the
+    file handles are only ever touched from this one thread.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+    
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue a call without waiting for it"""
+        return self._executor.submit(fn, *args, **kwargs)
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Queue a call and wait for its result"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+    
+    def shutdown(self):
+        """Finish everything queued, then stop the thread"""
+        self._executor.shutdown(wait=True)
@@ -1,34 +1,281 @@
+import asyncio
+import bisect
+import hashlib
+import heapq
 import json
 import os
-from typing import List, Dict, Optional
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from datetime import datetime
 import logging
 
+from .io_executor import run_blocking
+from .state import MemoryStateBackend
+
+try:
+    import orjson
+except ImportError:  # optional fast encoder
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+def encode_json(obj) -> bytes:
+    """Compact JSON bytes, via orjson when it's installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def read_json(path: str):
+    """Read a JSON file (blocking - call it through run_blocking)"""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def split_location(location: str) -> Tuple[str, str]:
+    """Split a "City, ST" string into (city, state)"""
+    parts = location.split(",")
+    city = parts[0].strip() if len(parts) > 0 else ""
+    state = parts[1].strip() if len(parts) > 1 else ""
+    return city, state
+
+
+class LaneIndex:
+    """
+    Inverted index over the load board
+    
+    Maps each searchable field (origin/destination city and state,
+    equipment type, pickup date) to posting sets of load IDs, so a search
+    intersects a few small sets instead of scanning every load. Also keeps
+    the board ordered by rate so unfiltered searches can stop after K hits.
+    """
+    
+    FIELDS = (
+        "origin_city", "origin_state",
+        "destination_city", "destination_state",
+        "equipment_type", "pickup_date",
+    )
+    
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, Set[str]]] = {
+            field: defaultdict(set) for field in self.FIELDS
+        }
+        self.available: Set[str] = set()
+        self.by_rate: List[Tuple[float, str]] = []  # (-rate, load_id), best first
+    
+    @staticmethod
+    def _keys(load: Dict) -> Dict[str, str]:
+        """Normalized index keys for a single load"""
+        origin_city, origin_state = split_location(load.get("origin", ""))
+        dest_city, dest_state = split_location(load.get("destination", ""))
+        return {
+            "origin_city": origin_city.lower(),
+            "origin_state": origin_state.lower(),
+            "destination_city": dest_city.lower(),
+            "destination_state": dest_state.lower(),
+            "equipment_type": load.get("equipment_type", "").lower(),
+            "pickup_date": load.get("pickup_datetime", "").split("T")[0],
+        }
+    
+    @staticmethod
+    def _rate_key(load: Dict) -> Tuple[float, str]:
+        return (-load.get("loadboard_rate", 0), load["load_id"])
+    
+    @classmethod
+    def build(cls, loads: Iterable[Dict], booked: Set[str] = frozenset()) -> "LaneIndex":
+        """Index a whole board - one sort for the rate order instead of an insort per load"""
+        index = cls()
+        for load in loads:
+            index._post(load, booked=load["load_id"] in booked)
+            index.by_rate.append(cls._rate_key(load))
+        index.by_rate.sort()
+        return index
+    
+    def _post(self, load: Dict, booked: bool = False):
+        load_id = load["load_id"]
+        for field, key in self._keys(load).items():
+            self.postings[field][key].add(load_id)
+        if not booked:
+            self.available.add(load_id)
+    
+    def add(self, load: Dict, booked: bool = False):
+        """Index a load"""
+        self._post(load, booked=booked)
+        bisect.insort(self.by_rate, self._rate_key(load))
+    
+    def remove(self, load: Dict):
+        """Drop a load from every posting set"""
+        load_id = load["load_id"]
+        for field, key in self._keys(load).items():
+            postings = self.postings[field]
+            postings[key].discard(load_id)
+            if not postings[key]:
+                del postings[key]
+        rate_key = self._rate_key(load)
+        position = bisect.bisect_left(self.by_rate, rate_key)
+        if position < len(self.by_rate) and self.by_rate[position] == rate_key:
+            del self.by_rate[position]
+        self.available.discard(load_id)
+    
+    def mark_booked(self, load_id: str):
+        self.available.discard(load_id)
+    
+    def mark_available(self, load_id: str):
+        self.available.add(load_id)
+    
+    def lookup(self, field: str, term: str, partial: bool = False) -> Set[str]:
+        """
+        Load IDs whose `field` matches `term`
+        
+        Exact lookups are a single dict hit. Partial lookups keep the old
+        substring behaviour ("los" finds "Los Angeles") by scanning the
+        distinct keys for the field, which is far smaller than the board.
+        """
+        term = term.strip().lower()
+        postings = self.postings[field]
+        if not partial:
+            return postings.get(term, set())
+        
+        matched = set()
+        for key, load_ids in postings.items():
+            if term in key:
+                matched |= load_ids
+        return matched
+    
+    def match_city(self, prefix: str, term: str) -> Set[str]:
+        """
+        Loads whose origin/destination city contains `term`
+        
+        The voice agent often passes a whole "City, ST" - then the city
+        part is matched as a substring and the state part exactly.
+        """
+        if "," not in term:
+            return self.lookup(f"{prefix}_city", term, partial=True)
+        city, state = split_location(term)
+        matched = self.lookup(f"{prefix}_city", city, partial=True)
+        if state:
+            matched = matched & self.lookup(f"{prefix}_state", state)
+        return matched
+    
+    def match_location(self, prefix: str, city: Optional[str], state: Optional[str]) -> Set[str]:
+        """Loads whose origin/destination matches the city OR the state"""
+        matched = set()
+        if city:
+            matched |= self.match_city(prefix, city)
+        if state:
+            matched |= self.lookup(f"{prefix}_state", state)
+        return matched
+    
+    def top_by_rate(self, limit: int, include_booked: bool = False) -> List[str]:
+        """Walk the rate ordering lazily and stop after `limit` hits"""
+        top = []
+        if limit <= 0:
+            return top
+        for _, load_id in self.by_rate:
+            if include_booked or load_id in self.available:
+                top.append(load_id)
+                if len(top) >= limit:
+                    break
+        return top
+
+
 class LoadService:
-    """Service for managing and searching freight loads"""
+    """
+    Service for managing and searching freight loads
     
-    def __init__(self, loads: List[Dict]):
+    Bookings are decided by the state backend (book-if-available is atomic
+    there); booked_loads is this process's view of them, caught up from
+    the backend's booking log before searches and availability checks.
+    """
+    
+    def __init__(self, loads: List[Dict], state=None):
         self.loads = loads
-        self.booked_loads = set()  # Track booked load IDs in memory
+        self._init_state(state)
+        self._build_index()
         logger.info(f"LoadService initialized with {len(loads)} loads")
     
+    def _init_state(self, state):
+        """Booking view, ETag and event state - the same whatever holds the board"""
+        self.state = state if state is not None else MemoryStateBackend()
+        self.booked_loads = set()  # Track booked load IDs in memory
+        self._bookings_cursor = (0, 0)
+        self._sync_lock = asyncio.Lock()  # one catch-up at a time, so none applies a stale read
+        self.events = None  # EventBroker for dashboard pushes, set once loaded
+        # Bumped by every change a search could see; with the per-process
+        # epoch it is the ETag of search results
+        self.version = 0
+        self._epoch = os.urandom(4).hex()
+    
+    def _build_index(self):
+        """Rebuild the load_id map and lane index from self.loads"""
+        booked = frozenset(self.booked_loads)
+        self._install(self.loads, self._build(self.loads, booked), booked)
+    
+    def _build(self, loads: List[Dict], booked: Set[str]) -> Tuple:
+        """
+        The load_id map, lane index and payloads for a board
+        
+        Reads nothing but its arguments, so reload can run it on the I/O
+        pool - on a large board this is seconds of work.
+        """
+        # load_id -> load, kept in step with self.loads by every mutation
+        loads_by_id: Dict[str, Dict] = {}
+        for load in loads:
+            load_id = load.get("load_id")
+            if load_id in loads_by_id:
+                logger.warning(f"Duplicate load_id {load_id} in load data, keeping the last entry")
+            loads_by_id[load_id] = load
+        index = LaneIndex.build(loads_by_id.values(), booked)
+        # load_id -> HappyRobot payload, rebuilt only when the load or its booking changes
+        payloads: Dict[str, Dict] = {}
+        payload_json: Dict[str, bytes] = {}  # the same payloads, pre-encoded
+        for load_id, load in loads_by_id.items():
+            payload = payloads[load_id] = self.format_load(load, booked=load_id in booked)
+            payload_json[load_id] = encode_json(payload)
+        return loads_by_id, index, payloads, payload_json
+    
+    def _install(self, loads: List[Dict], built: Tuple, booked: Set[str]):
+        """Swap in a board from _build, built against the bookings in `booked`"""
+        self.loads = loads
+        self.version += 1
+        self._loads_by_id, self._index, self._payloads, self._payload_json = built
+        # Bookings made or released while it was being built
+        for load_id in booked ^ self.booked_loads:
+            if load_id in self._loads_by_id:
+                if load_id in self.booked_loads:
+                    self._index.mark_booked(load_id)
+                else:
+                    self._index.mark_available(load_id)
+                self._refresh_payload(load_id)
+    
+    def _refresh_payload(self, load_id: str):
+        """Rebuild the cached HappyRobot payload for one load"""
+        load = self._loads_by_id.get(load_id)
+        if load is None:
+            self._payloads.pop(load_id, None)
+            self._payload_json.pop(load_id, None)
+        else:
+            payload = self.format_load(load, booked=load_id in self.booked_loads)
+            self._payloads[load_id] = payload
+            self._payload_json[load_id] = encode_json(payload)
+    
     @classmethod
-    async def initialize(cls, data_path: str = "data/loads.json"):
+    async def initialize(cls, data_path: str = "data/loads.json", state=None, events=None):
         """Load freight data from JSON file"""
         try:
-            with open(data_path, 'r') as f:
-                loads = json.load(f)
+            loads = await run_blocking(read_json, data_path)
             logger.info(f"Successfully loaded {len(loads)} loads from {data_path}")
-            return cls(loads)
         except FileNotFoundError:
             logger.error(f"Load data file not found: {data_path}")
-            return cls([])
+            loads = []
         except json.JSONDecodeError as e:
             logger.error(f"Invalid JSON in load data file: {e}")
-            return cls([])
+            loads = []
+        service = cls(loads, state=state)
+        await service.sync_bookings()
+        service.events = events
+        return service
     
     async def search(
         self,
@@ -49,95 +296,193 @@ class LoadService:
         2. Filter by equipment if provided
         3. Filter by destination if provided
         4. Filter by pickup date if provided
-        5. Sort by rate (highest first)
+        5. Return the top max_results by rate (highest first)
+        """
+        top_ids = await self._search_ids(
+            origin_city=origin_city,
+            origin_state=origin_state,
+            destination_city=destination_city,
+            destination_state=destination_state,
+            equipment_type=equipment_type,
+            pickup_date=pickup_date,
+            max_results=max_results,
+            include_booked=include_booked
+        )
+        return self._with_status(top_ids, include_booked)
+    
+    async def search_payloads(self, **filters) -> List[Dict]:
+        """Same search as `search`, returning prebuilt HappyRobot payloads"""
+        return [self._payloads[load_id] for load_id in await self._search_ids(**filters)]
+    
+    async def search_json(self, **filters) -> bytes:
+        """
+        Same search as `search`, as a complete pre-encoded HappyRobot response
+        
+        Each load's JSON is encoded once and cached, so a search only splices
+        cached bytes into the response envelope.
         """
+        loads_json = b",".join(self._payload_json[load_id] for load_id in await self._search_ids(**filters))
+        return b'{"statusCode":200,"body":{"loads":[' + loads_json + b"]}}"
+    
+    async def _search_ids(
+        self,
+        origin_city: Optional[str] = None,
+        origin_state: Optional[str] = None,
+        destination_city: Optional[str] = None,
+        destination_state: Optional[str] = None,
+        equipment_type: Optional[str] = None,  # NOW OPTIONAL
+        pickup_date: Optional[str] = None,
+        max_results: int = 10,
+        include_booked: bool = False
+    ) -> List[str]:
+        """IDs of the top matching loads, best paying first"""
+        await self.sync_bookings()
+        index = self._index
         
-        # If no search parameters provided, return all loads
+        # If no search parameters provided, return the best paying loads
         if not origin_city and not origin_state:
             if include_booked:
-                logger.info("No origin filter provided - returning ALL loads (including booked)")
-                # Return ALL loads with booking status
-                all_with_status = []
-                for load in self.loads:
-                    load_with_status = load.copy()
-                    load_with_status["is_booked"] = load.get("load_id") in self.booked_loads
-                    all_with_status.append(load_with_status)
-                return sorted(all_with_status, key=lambda x: x.get("loadboard_rate", 0), reverse=True)
+                logger.info("No origin filter provided - returning top loads (including booked)")
             else:
-                logger.info("No origin filter provided - returning all available loads")
-                # Filter out booked loads and sort by rate (highest first)
-                available_loads = [load for load in self.loads if load.get("load_id") not in self.booked_loads]
-                return sorted(available_loads, key=lambda x: x.get("loadboard_rate", 0), reverse=True)
+                logger.info("No origin filter provided - returning top available loads")
+            return index.top_by_rate(max_results, include_booked=include_booked)
+        
+        # REQUIRED: Origin must match (city OR state)
+        candidate_sets = [index.match_location("origin", origin_city, origin_state)]
+        
+        # OPTIONAL: Destination filter
+        if destination_city or destination_state:
+            candidate_sets.append(
+                index.match_location("destination", destination_city, destination_state)
+            )
+        
+        # OPTIONAL: Equipment type filter
+        if equipment_type:
+            candidate_sets.append(index.lookup("equipment_type", equipment_type))
+        
+        # OPTIONAL: Pickup date filter
+        if pickup_date:
+            candidate_sets.append(index.lookup("pickup_date", pickup_date.split("T")[0]))
+        
+        # Skip booked loads unless explicitly included
+        if not include_booked:
+            candidate_sets.append(index.available)
+        
+        # Intersect smallest first so the work is bounded by the tightest filter
+        candidate_sets.sort(key=len)
+        matched_ids = candidate_sets[0].intersection(*candidate_sets[1:])
+        
+        # Top-K selection (highest paying loads first) instead of sorting every match;
+        # ties go by load_id, as in top_by_rate, so every worker gives the same answer
+        top_ids = heapq.nsmallest(
+            max_results,
+            matched_ids,
+            key=lambda load_id: LaneIndex._rate_key(self._loads_by_id[load_id])
+        )
+        
+        logger.info(f"Search matched {len(matched_ids)} loads (showing top {max_results})")
+        
+        return top_ids
+    
+    def _with_status(self, load_ids: List[str], include_booked: bool) -> List[Dict]:
+        """Resolve load IDs, adding booking status when including booked loads"""
+        if not include_booked:
+            return [self._loads_by_id[load_id] for load_id in load_ids]
         
         results = []
+        for load_id in load_ids:
+            load_with_status = self._loads_by_id[load_id].copy()
+            load_with_status["is_booked"] = load_id in self.booked_loads
+            results.append(load_with_status)
+        return results
+    
+    def format_load(self, load: Dict, booked: bool = False) -> Dict:
+        """Shape a load as a HappyRobot load record (SIMPLIFIED FLAT STRUCTURE)"""
+        origin_city, origin_state = split_location(load["origin"])
+        dest_city, dest_state = split_location(load["destination"])
         
-        for load in self.loads:
-            # Skip booked loads unless explicitly included
-            if not include_booked and load.get("load_id") in self.booked_loads:
-                continue
-                
-            load_origin = load.get("origin", "").lower()
+        # Calculate rate per mile
+        rate_per_mile = round(load["loadboard_rate"] / load["miles"], 2) if load["miles"] > 0 else 0
+        
+        return {
+            # Identifiers
+            "reference_number": load["load_id"],
+            "load_id": load["load_id"],
             
-            # REQUIRED: Origin must match
-            origin_matches = False
+            # Contact
+            "contact": {
+                "name": "Dispatch",
+                "email": "dispatch@acmelogistics.com",
+                "phone": "18005551234",
+                "extension": "",
+                "type": "dispatch"
+            },
             
-            if origin_city and origin_city.lower() in load_origin:
-                origin_matches = True
+            # Type and status
+            "type": "can_get",
+            "status": "booked" if booked else "available",
+            "is_partial": False,
             
-            if origin_state and origin_state.lower() in load_origin:
-                origin_matches = True
+            # Stops (required by HappyRobot)
+            "stops": [
+                {
+                    "type": "origin",
+                    "location": {
+                        "city": origin_city,
+                        "state": origin_state,
+                        "zip": "",
+                        "country": "US"
+                    },
+                    "stop_timestamp_open": load["pickup_datetime"],
+                    "stop_timestamp_close": load["pickup_datetime"]
+                },
+                {
+                    "type": "destination",
+                    "location": {
+                        "city": dest_city,
+                        "state": dest_state,
+                        "zip": "",
+                        "country": "US"
+                    },
+                    "stop_timestamp_open": load["delivery_datetime"],
+                    "stop_timestamp_close": load["delivery_datetime"]
+                }
+            ],
             
-            if not origin_matches:
-                continue
+            # Route info (flat)
+            "origin": load["origin"],
+            "destination": load["destination"],
+            "miles": load["miles"],
             
-            # OPTIONAL: Equipment type filter
-            if equipment_type:
-                load_equipment = load.get("equipment_type", "").lower()
-                if equipment_type.lower() != load_equipment:
-                    continue
+            # Equipment and cargo (flat)
+            "equipment_type": load["equipment_type"],
+            "weight": load["weight"],
+            "number_of_pieces": load["num_of_pieces"],
+            "commodity_type": load["commodity_type"],
+            "dimensions": load.get("dimensions", ""),
             
-            # OPTIONAL: Destination filter
-            if destination_city or destination_state:
-                load_destination = load.get("destination", "").lower()
-                
-                destination_matches = False
-                
-                if destination_city and destination_city.lower() in load_destination:
-                    destination_matches = True
-                
-                if destination_state and destination_state.lower() in load_destination:
-                    destination_matches = True
-                
-                if not destination_matches:
-                    continue
+            # Pricing (flat)
+            "posted_carrier_rate": load["loadboard_rate"],
+            "max_buy": round(load["loadboard_rate"] * 1.05, 2),
+            "rate_per_mile": rate_per_mile,
             
-            # OPTIONAL: Pickup date filter
-            if pickup_date:
-                try:
-                    load_pickup = load.get("pickup_datetime", "")
-                    load_date = load_pickup.split("T")[0]
-                    search_date = pickup_date.split("T")[0]
-                    if load_date != search_date:
-                        continue
-                except (IndexError, ValueError):
-                    pass
+            # Schedule (flat)
+            "pickup_datetime": load["pickup_datetime"],
+            "delivery_datetime": load["delivery_datetime"],
+            "pickup_date": load["pickup_datetime"].split("T")[0],
+            "delivery_date": load["delivery_datetime"].split("T")[0],
             
-            # This load matches all criteria
-            if include_booked:
-                # Add booking status when including booked loads
-                load_with_status = load.copy()
-                load_with_status["is_booked"] = load.get("load_id") in self.booked_loads
-                results.append(load_with_status)
-            else:
-                results.append(load)
-        
-        # Sort by rate (highest paying loads first)
-        results.sort(key=lambda x: x.get("loadboard_rate", 0), reverse=True)
-        
-        logger.info(f"Search returned {len(results)} loads (showing top {max_results})")
-        
-        # Return top N results
-        return results[:max_results]
+            # Notes
+            "notes": self.generate_load_notes(load),
+            "sale_notes": load.get("notes", ""),
+            
+            # Metadata
+            "branch": "Main",
+            "bridge": {
+                "status": "success",
+                "bridge_load_id": f"BRK-{load['load_id']}"
+            }
+        }
     
     def generate_load_notes(self, load: Dict) -> str:
         """
@@ -163,34 +508,295 @@ class LoadService:
     
     async def get_by_id(self, load_id: str) -> Optional[Dict]:
         """Get a specific load by ID"""
-        for load in self.loads:
-            if load.get("load_id") == load_id:
-                return load
-        return None
+        return self._loads_by_id.get(load_id)
     
     async def get_all(self) -> List[Dict]:
         """Get all available loads"""
         return self.loads
     
+    async def count(self) -> int:
+        """Number of loads on the board"""
+        return len(self.loads)
+    
     async def reload(self, data_path: str = "api/data/loads.json"):
         """Reload loads from file (useful for admin/demo)"""
         try:
-            with open(data_path, 'r') as f:
-                self.loads = json.load(f)
+            loads = await run_blocking(read_json, data_path)
+            booked = frozenset(self.booked_loads)
+            # Build the new board off the loop; searches keep using the old one until the swap
+            self._install(loads, await run_blocking(self._build, loads, booked), booked)
             logger.info(f"Reloaded {len(self.loads)} loads from {data_path}")
             return True
         except Exception as e:
             logger.error(f"Failed to reload loads: {e}")
             return False
     
-    def mark_as_booked(self, load_id: str) -> bool:
-        """Mark a load as booked"""
+    async def add_load(self, load: Dict) -> bool:
+        """Add a new load to the board"""
+        load_id = load.get("load_id")
+        if not load_id or load_id in self._loads_by_id:
+            return False
+        self.loads.append(load)
+        self.version += 1
+        self._loads_by_id[load_id] = load
+        self._index.add(load, booked=load_id in self.booked_loads)
+        self._refresh_payload(load_id)
+        logger.info(f"Load {load_id} added to the board")
+        return True
+    
+    async def remove_load(self, load_id: str) -> Optional[Dict]:
+        """Remove a load from the board"""
+        load = self._loads_by_id.pop(load_id, None)
+        if load is None:
+            return None
+        self.loads.remove(load)
+        self.version += 1
+        self._index.remove(load)
+        self._refresh_payload(load_id)
+        logger.info(f"Load {load_id} removed from the board")
+        return load
+    
+    async def mark_as_booked(self, load_id: str) -> bool:
+        """Book a load if it is still available - True only for the caller that won it"""
+        if not await self.state.run(self.state.book, load_id):
+            await self.sync_bookings()  # booked elsewhere - make sure our view shows it
+            return False
+        self._apply_booking(load_id)
+        logger.info(f"Load {load_id} marked as booked")
+        return True
+    
+    def _apply_booking(self, load_id: str):
+        """Reflect a booking in the local view (idempotent)"""
         if load_id not in self.booked_loads:
             self.booked_loads.add(load_id)
-            logger.info(f"Load {load_id} marked as booked")
-            return True
-        return False
+            self.version += 1
+            if load_id in self._loads_by_id:
+                self._index.mark_booked(load_id)
+                self._refresh_payload(load_id)
+            self._publish("booking", {"load_id": load_id})
+    
+    def _release_all(self):
+        """Drop every booking from the local view"""
+        released = list(self.booked_loads)
+        self.booked_loads.clear()
+        self.version += 1
+        for load_id in released:
+            if load_id in self._loads_by_id:
+                self._index.mark_available(load_id)
+                self._refresh_payload(load_id)
+        self._publish("bookings_cleared")
+    
+    async def etag(self) -> str:
+        """Strong ETag for search results - changes whenever any search result could"""
+        await self.sync_bookings()
+        return f'"{self._epoch}-{self.version}"'
+    
+    def _publish(self, event: str, data: Optional[Dict] = None):
+        """Push a booking change to dashboards"""
+        if self.events is not None:
+            self.events.publish(event, data or {})
+    
+    async def sync_bookings(self):
+        """Catch up with bookings made by other processes sharing the state backend"""
+        async with self._sync_lock:
+            self._bookings_cursor, reset, booked = await self.state.run(
+                self.state.bookings_since, self._bookings_cursor
+            )
+            if reset:
+                self._release_all()
+            for load_id in booked:
+                self._apply_booking(load_id)
     
-    def is_load_available(self, load_id: str) -> bool:
+    async def flush_bookings(self, load_id: str):
+        """Wait until a booking we won is durable (the journal fsyncs off the event loop); raises if it can't be"""
+        await self.state.flush(load_id)
+    
+    async def unbook(self, load_id: str):
+        """Release a booking we won but couldn't confirm, so the load can be booked again"""
+        if await self.state.run(self.state.unbook, load_id):
+            await self.state.flush(load_id)
+            logger.info(f"Load {load_id} released")
+        await self.sync_bookings()
+    
+    async def clear_bookings(self):
+        """Release every booked load (used by the metrics reset)"""
+        await self.state.run(self.state.clear_bookings)
+        await self.sync_bookings()
+    
+    async def is_load_available(self, load_id: str) -> bool:
         """Check if a load is available (not booked)"""
-        return load_id not in self.booked_loads
\ No newline at end of file
+        await self.sync_bookings()
+        return load_id not in self.booked_loads
+
+
+class SQLiteLoadService(LoadService):
+    """
+    LoadService on the SQLite storage engine (STORAGE_BACKEND=sqlite)
+    
+    The board is an indexed table instead of a list in memory. Each load's
+    payloads (available and booked) are encoded once, at import, so a
+    search is one indexed query on the I/O pool plus splicing stored bytes.
+    Bookings still come from the state backend; booked_loads is the only
+    per-load state kept in memory.
+    """
+    
+    # Version of the stored row and payload shapes: bump it whenever _row,
+    # format_load or anything they call changes what gets stored, so
+    # existing stores re-import even if loads.json hasn't changed
+    ROW_FORMAT = 1
+    
+    def __init__(self, store, state=None):
+        self.store = store
+        self._init_state(state)
+    
+    @classmethod
+    async def initialize(cls, data_path: str = "data/loads.json", store=None, state=None, events=None):
+        """Import the load file into the store if it changed since the last import"""
+        service = cls(store, state=state)
+        await service.sync_bookings()
+        await run_blocking(service._import, data_path)
+        logger.info(f"LoadService initialized with {await service.count()} loads in {store.path}")
+        service.events = events
+        return service
+    
+    def _import(self, data_path: str, force: bool = False) -> bool:
+        """Replace the stored board with the load file (blocking)"""
+        try:
+            with open(data_path, 'rb') as f:
+                raw = f.read()
+            source = f"{hashlib.sha256(raw).hexdigest()}:{self.ROW_FORMAT}"
+            if not force and self.store.loads_source() == source:
+                logger.info(f"Stored loads are up to date with {data_path}")
+                return True
+            loads = json.loads(raw)
+        except FileNotFoundError:
+            logger.error(f"Load data file not found: {data_path} (keeping stored loads)")
+            return False
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON in load data file: {e} (keeping stored loads)")
+            return False
+        
+        if len({load.get("load_id") for load in loads}) < len(loads):
+            logger.warning(f"Duplicate load_ids in {data_path}, keeping the last entry of each")
+        if self.store.replace_loads([self._row(load) for load in loads], source, force=force):
+            self.version += 1
+            logger.info(f"Imported {len(loads)} loads from {data_path}")
+        return True
+    
+    def _row(self, load: Dict) -> Tuple:
+        """A load as a store row: search keys, the record and both payloads"""
+        keys = LaneIndex._keys(load)
+        return (
+            load["load_id"],
+            *(keys[field] for field in LaneIndex.FIELDS),
+            load.get("loadboard_rate", 0),
+            json.dumps(load, separators=(",", ":")),
+            encode_json(self.format_load(load, booked=False)),
+            encode_json(self.format_load(load, booked=True)),
+        )
+    
+    async def _query(
+        self,
+        columns: Tuple[str, ...],
+        origin_city: Optional[str] = None,
+        origin_state: Optional[str] = None,
+        destination_city: Optional[str] = None,
+        destination_state: Optional[str] = None,
+        equipment_type: Optional[str] = None,
+        pickup_date: Optional[str] = None,
+        max_results: int = 10,
+        include_booked: bool = False
+    ) -> Tuple[List[Tuple], Set[str]]:
+        """Rows (load_id, *columns) of the top matching loads, and the bookings they were matched against"""
+        await self.sync_bookings()
+        booked = frozenset(self.booked_loads)
+        
+        def term(value: Optional[str]) -> Optional[str]:
+            return value.strip().lower() if value else None
+        
+        filters = {}
+        # Without an origin the other filters don't apply - the best paying loads, as before
+        if origin_city or origin_state:
+            filters = {
+                "origin_city": term(origin_city),
+                "origin_state": term(origin_state),
+                "destination_city": term(destination_city),
+                "destination_state": term(destination_state),
+                "equipment_type": term(equipment_type),
+                "pickup_date": pickup_date.split("T")[0].strip().lower() if pickup_date else None,
+            }
+        rows = await run_blocking(
+            self.store.search_loads,
+            columns,
+            limit=max_results,
+            exclude=frozenset() if include_booked else booked,
+            **filters
+        )
+        logger.info(f"Search returned {len(rows)} loads (max {max_results})")
+        return rows, booked
+    
+    async def search(self, **filters) -> List[Dict]:
+        rows, booked = await self._query(("load",), **filters)
+        results = []
+        for load_id, load in rows:
+            load = json.loads(load)
+            if filters.get("include_booked"):
+                load["is_booked"] = load_id in booked
+            results.append(load)
+        return results
+    
+    async def search_payloads(self, **filters) -> List[Dict]:
+        rows, booked = await self._query(("payload", "booked_payload"), **filters)
+        return [json.loads(booked_payload if load_id in booked else payload) for load_id, payload, booked_payload in rows]
+    
+    async def search_json(self, **filters) -> bytes:
+        rows, booked = await self._query(("payload", "booked_payload"), **filters)
+        loads_json = b",".join(
+            booked_payload if load_id in booked else payload for load_id, payload, booked_payload in rows
+        )
+        return b'{"statusCode":200,"body":{"loads":[' + loads_json + b"]}}"
+    
+    async def get_by_id(self, load_id: str) -> Optional[Dict]:
+        return await run_blocking(self.store.get_load, load_id)
+    
+    async def get_all(self) -> List[Dict]:
+        return await run_blocking(self.store.all_loads)
+    
+    async def count(self) -> int:
+        return await run_blocking(self.store.load_count)
+    
+    async def reload(self, data_path: str = "api/data/loads.json"):
+        """Re-import the load file, replacing the stored board"""
+        try:
+            return await run_blocking(self._import, data_path, True)
+        except Exception as e:
+            logger.error(f"Failed to reload loads: {e}")
+            return False
+    
+    async def add_load(self, load: Dict) -> bool:
+        """Add a new load to the board"""
+        if not load.get("load_id") or not await self.store.run(self.store.add_load, self._row(load)):
+            return False
+        self.version += 1
+        logger.info(f"Load {load['load_id']} added to the board")
+        return True
+    
+    async def remove_load(self, load_id: str) -> Optional[Dict]:
+        """Remove a load from the board"""
+        load = await self.store.run(self.store.remove_load, load_id)
+        if load is not None:
+            self.version += 1
+            logger.info(f"Load {load_id} removed from the board")
+        return load
+    
+    def _apply_booking(self, load_id: str):
+        # Payloads for both states are already stored
+        if load_id not in self.booked_loads:
+            self.booked_loads.add(load_id)
+            self.version += 1
+            self._publish("booking", {"load_id": load_id})
+    
+    def _release_all(self):
+        self.booked_loads.clear()
+        self.version += 1
+        self._publish("bookings_cleared")
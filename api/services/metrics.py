@@ -1,43 +1,479 @@
+import asyncio
+import bisect
 import json
 import os
 from typing import Dict, List, Optional
 from datetime import datetime
 import logging
 
+from .io_executor import SerialExecutor, run_blocking
+from .state import read_jsonl
+
 logger = logging.getLogger(__name__)
 
 
+class CallRollups:
+    """
+    Hourly and daily call totals, kept up to date as calls are logged
+    
+    A bucket is keyed by a prefix of its calls' timestamps ("2025-01-15T14"
+    for an hour, "2025-01-15" for a day), so filing a call is a dict lookup
+    per granularity and a time range is a bisect over the sorted keys - a
+    30-day hourly series reads 720 buckets, not every call.
+    """
+    
+    GRANULARITIES = {"hour": 13, "day": 10}  # timestamp prefix length
+    
+    def __init__(self):
+        self.buckets: Dict[str, Dict[str, Dict]] = {granularity: {} for granularity in self.GRANULARITIES}
+        self._keys: Dict[str, List[str]] = {granularity: [] for granularity in self.GRANULARITIES}
+    
+    @staticmethod
+    def _empty() -> Dict:
+        return {
+            "calls": 0,
+            "bookings": 0,
+            "booked_value": 0.0,
+            "negotiation_rounds": 0,
+            "booked_rounds": 0,  # rounds summed over booked calls, as in avg_negotiation_rounds
+            "call_duration_seconds": 0,
+            "timed_calls": 0,  # calls that reported a duration
+            "outcomes": {},
+            "sentiments": {}
+        }
+    
+    def _bucket(self, granularity: str, key: str) -> Dict:
+        buckets = self.buckets[granularity]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = self._empty()
+            keys = self._keys[granularity]
+            if keys and key < keys[-1]:
+                bisect.insort(keys, key)  # a late call for an earlier hour
+            else:
+                keys.append(key)
+        return bucket
+    
+    def add_totals(
+        self, granularity: str, key: str, outcome: str, sentiment: str,
+        calls: int, rounds: int, agreed_value: float, duration: int, timed: int
+    ):
+        """Fold in `calls` calls with the same outcome and sentiment"""
+        bucket = self._bucket(granularity, key)
+        bucket["calls"] += calls
+        bucket["negotiation_rounds"] += rounds
+        bucket["call_duration_seconds"] += duration
+        bucket["timed_calls"] += timed
+        bucket["outcomes"][outcome] = bucket["outcomes"].get(outcome, 0) + calls
+        bucket["sentiments"][sentiment] = bucket["sentiments"].get(sentiment, 0) + calls
+        if outcome == "booked":
+            bucket["bookings"] += calls
+            bucket["booked_value"] += agreed_value
+            bucket["booked_rounds"] += rounds
+    
+    def add(self, call: Dict):
+        """File one call under its hour and its day"""
+        timestamp = call.get("timestamp", "")
+        duration = call.get("call_duration_seconds")
+        for granularity, width in self.GRANULARITIES.items():
+            self.add_totals(
+                granularity,
+                timestamp[:width],
+                call.get("outcome", "unknown"),
+                call.get("sentiment", "neutral"),
+                1,
+                call.get("negotiation_rounds", 0) or 0,
+                call.get("agreed_rate", 0) or 0,
+                duration or 0,
+                duration is not None
+            )
+    
+    def range(self, granularity: str, start: str, end: str) -> List[Dict]:
+        """Non-empty buckets from the one holding `start` to the one holding `end` (ISO timestamps), oldest first"""
+        width = self.GRANULARITIES[granularity]
+        keys = self._keys[granularity]
+        low = bisect.bisect_left(keys, start[:width])
+        high = bisect.bisect_right(keys, end[:width])
+        return [self._export(key, self.buckets[granularity][key]) for key in keys[low:high]]
+    
+    @staticmethod
+    def _export(key: str, bucket: Dict) -> Dict:
+        return dict(
+            bucket,
+            bucket=key,
+            booked_value=round(bucket["booked_value"], 2),
+            outcomes=dict(bucket["outcomes"]),
+            sentiments=dict(bucket["sentiments"])
+        )
+    
+    def to_dict(self) -> Dict:
+        """A copy safe to serialize on another thread"""
+        return {
+            granularity: {key: self._export(key, bucket) for key, bucket in buckets.items()}
+            for granularity, buckets in self.buckets.items()
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "CallRollups":
+        rollups = cls()
+        for granularity in cls.GRANULARITIES:
+            for key, bucket in sorted(data.get(granularity, {}).items()):
+                bucket = dict(bucket)
+                bucket.pop("bucket", None)
+                rollups.buckets[granularity][key] = bucket
+                rollups._keys[granularity].append(key)
+        return rollups
+
+
 class MetricsService:
     """
     Service for tracking and reporting call metrics
     Simplified version - HappyRobot handles negotiation
+    
+    Persistence is a snapshot (metrics.json) plus an append-only JSONL call
+    log next to it. Logging a call appends one line; the snapshot is only
+    rewritten on compaction. The log's first line carries a generation
+    number and the snapshot records the last generation it covers, so a
+    crash between writing the snapshot and starting a new log never replays
+    calls twice.
+    
+    The event loop never touches the files: appends, fsyncs and snapshots
+    all run in order on the service's own I/O thread. A snapshot is written
+    from a copy of the call list, so calls keep being logged while a large
+    snapshot is on its way to disk.
+    
+    Appends are group-committed: calls logged within `commit_window`
+    seconds of each other (or `commit_batch` of them) go to disk as one
+    write and one fsync. log_call(durable=True) waits for that commit.
+    
+    With a shared state backend (several worker processes) the backend's
+    call log is the record instead: each process appends to it and folds in
+    everyone's new calls before answering reads. The JSON files then only
+    seed it once.
     """
     
-    def __init__(self, data_path: str = "data/metrics.json"):
+    def __init__(
+        self,
+        data_path: str = "data/metrics.json",
+        commit_window: float = 0.1,
+        commit_batch: int = 100,
+        compact_every: int = 1000,
+        recent_limit: int = 50,
+        state=None
+    ):
         self.data_path = data_path
-        self.calls: List[Dict] = []
-        self._load()
+        self.log_path = os.path.splitext(data_path)[0] + ".log.jsonl"
+        self.commit_window = commit_window  # commit a batch this long after its first call...
+        self.commit_batch = commit_batch  # ...or as soon as it holds this many
+        self.compact_every = compact_every  # fold the log into the snapshot this often
+        self.recent_limit = recent_limit  # size of the recent_calls window in get_metrics
+        self.calls: List[Dict] = []  # ordered by (timestamp, call_id), oldest first
+        self._by_seq: List[Dict] = []  # the same calls ordered by seq, for delta sync
+        self._last_seq = 0  # highest seq ever assigned - kept across resets so seqs never repeat
+        self._rollups_cover = 0  # snapshot calls already counted in rollups restored from it
+        self.state = state if state is not None and state.shared else None
+        self._calls_cursor = (0, 0)
+        self._sync_lock = asyncio.Lock()  # one catch-up at a time, so no call is folded in twice
+        self._generation = 0
+        self._log_file = None
+        self._log_entries = 0
+        self._batch: Optional[List[Dict]] = None  # calls waiting for the next group commit
+        self._batch_done: Optional[asyncio.Future] = None  # resolves when that commit is on disk
+        self._commit_timer: Optional[asyncio.TimerHandle] = None
+        self._last_commit: Optional[asyncio.Future] = None
+        self._io = SerialExecutor("metrics-io")
+        self._save_lock = asyncio.Lock()
+        self._queued_save: Optional[asyncio.Future] = None
+        self.events = None  # EventBroker for dashboard pushes, set once history is loaded
+        # Bumped by every change to the history; with the per-process epoch
+        # it is the ETag of /metrics
+        self.version = 0
+        self._epoch = os.urandom(4).hex()
+        self._reset_aggregates()
+    
+    @classmethod
+    async def initialize(cls, data_path: str = "data/metrics.json", events=None, **options):
+        """Create the service and load its history on the I/O thread"""
+        service = cls(data_path, **options)
+        await service._io.run(service._load)
+        if service.state is not None:
+            await service.sync()
+            logger.info(f"Loaded {len(service.calls)} call records from the shared call log")
+        service.events = events
+        return service
     
     def _load(self):
-        """Load existing metrics from file"""
+        """Load the snapshot, then replay the call log on top of it"""
+        snapshot_generation = self._read_snapshot()
+        replayed = self._replay_log(snapshot_generation)
+        
+        if self.state is not None:
+            # Shared call log - the files only seed it, the first time any worker starts
+            if self.state.seed_calls(sorted(self.calls, key=self._order_key)):
+                logger.info(f"Seeded shared call log with {len(self.calls)} calls from {self.data_path}")
+            self.calls = []
+            self.rollups = CallRollups()  # rebuilt from the shared log by sync
+            return
+        
+        try:
+            if replayed is None:
+                # No usable log for this snapshot - start a fresh generation
+                self._generation = snapshot_generation + 1
+                self._start_log(self._generation)
+            else:
+                self._log_entries = replayed
+                self._open_log()
+        except Exception as e:
+            logger.error(f"Failed to open call log {self.log_path}: {e}")
+        
+        # Rollups saved with the snapshot already count its calls - add the replayed ones
+        for call in self.calls[self._rollups_cover:]:
+            self.rollups.add(call)
+        
+        # Keep calls in time order so the most recent are always at the end
+        self.calls.sort(key=self._order_key)
+        self._number_calls()
+        for call in self.calls:
+            self._aggregate(call)
+        
+        logger.info(f"Loaded {len(self.calls)} call records ({self._log_entries} replayed from log)")
+    
+    def _number_calls(self):
+        """Give calls from before sequence numbers existed seqs 1..n in time order, then index by seq"""
+        unnumbered = [call for call in self.calls if "seq" not in call]
+        for seq, call in enumerate(unnumbered, 1):
+            call["seq"] = seq  # the same numbers on every load, until a snapshot stores them
+        self._last_seq = max(self._last_seq, len(unnumbered), *(call["seq"] for call in self.calls))
+        self._by_seq = sorted(self.calls, key=self._seq_key)
+    
+    @staticmethod
+    def _seq_key(call: Dict) -> int:
+        return call["seq"]
+    
+    def _read_snapshot(self) -> int:
+        """Read metrics.json into self.calls, returning the generation it covers"""
+        snapshot_generation = -1
         try:
             if os.path.exists(self.data_path):
                 with open(self.data_path, 'r') as f:
-                    self.calls = json.load(f)
-                logger.info(f"Loaded {len(self.calls)} call records")
+                    snapshot = json.load(f)
+                if isinstance(snapshot, list):
+                    # Legacy format: a bare list of calls
+                    self.calls = snapshot
+                else:
+                    self.calls = snapshot.get("calls", [])
+                    snapshot_generation = snapshot.get("generation", -1)
+                    self._last_seq = snapshot.get("last_seq", 0)
+                    if "rollups" in snapshot:
+                        self.rollups = CallRollups.from_dict(snapshot["rollups"])
+                        self._rollups_cover = len(self.calls)
         except Exception as e:
             logger.error(f"Failed to load metrics: {e}")
             self.calls = []
+        return snapshot_generation
     
-    async def save(self):
-        """Save metrics to file"""
+    async def sync(self):
+        """Fold in calls other workers logged to the shared call log (no-op without one)"""
+        if self.state is None:
+            return
+        async with self._sync_lock:
+            self._calls_cursor, reset, calls = await self.state.run(self.state.calls_since, self._calls_cursor)
+            if reset:
+                self.calls = []
+                self._by_seq = []
+                self._reset_aggregates()
+                self._publish("calls_cleared")
+            for call in calls:
+                self._insert(call)
+    
+    def _insert(self, call_record: Dict):
+        """Add a call to the time-ordered history and the running counters"""
+        if self.calls and self._order_key(call_record) < self._order_key(self.calls[-1]):
+            # Clock stepped backwards (or another worker's call landed late) - keep the history ordered
+            bisect.insort(self.calls, call_record, key=self._order_key)
+        else:
+            self.calls.append(call_record)
+        self._by_seq.append(call_record)  # seqs are handed out in insertion order
+        self._last_seq = call_record["seq"]
+        self._aggregate(call_record)
+        self.rollups.add(call_record)
+        self.version += 1
+        self._publish("call", call_record)
+    
+    def _publish(self, event: str, data: Optional[Dict] = None):
+        """Push a change to dashboards; counters follow, debounced"""
+        if self.events is not None:
+            self.events.publish(event, data or {})
+            self.events.publish_soon("metrics", self.get_counters)
+    
+    @staticmethod
+    def _order_key(call: Dict):
+        """Sort key for the time-ordered call history (also the page cursor)"""
+        return (call.get("timestamp", ""), call.get("call_id", ""))
+    
+    def _reset_aggregates(self):
+        """Zero the running counters behind get_metrics"""
+        self.version += 1
+        self.rollups = CallRollups()
+        self._successful_count = 0
+        self._booked_rounds = 0  # negotiation rounds summed over booked calls
+        self._booked_value = 0.0
+        self._outcomes: Dict[str, int] = {}
+        self._sentiments: Dict[str, int] = {}
+    
+    def _aggregate(self, call: Dict):
+        """Fold one call into the running counters"""
+        outcome = call.get("outcome", "unknown")
+        sentiment = call.get("sentiment", "neutral")
+        self._outcomes[outcome] = self._outcomes.get(outcome, 0) + 1
+        self._sentiments[sentiment] = self._sentiments.get(sentiment, 0) + 1
+        
+        if outcome == "booked":
+            self._successful_count += 1
+            self._booked_rounds += call.get("negotiation_rounds", 0) or 0
+            self._booked_value += call.get("agreed_rate", 0) or 0
+    
+    def _replay_log(self, snapshot_generation: int) -> Optional[int]:
+        """Append logged calls newer than the snapshot, returning how many"""
+        if not os.path.exists(self.log_path):
+            return None
         try:
-            os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
-            with open(self.data_path, 'w') as f:
-                json.dump(self.calls, f, indent=2)
-            logger.info(f"Saved {len(self.calls)} call records")
+            with open(self.log_path, 'rb+') as f:
+                header = json.loads(f.readline() or b"{}")
+                generation = header.get("generation", -1)
+                if generation <= snapshot_generation:
+                    # Already folded into the snapshot
+                    return None
+                
+                replayed = 0
+                for call in read_jsonl(f, self.log_path):
+                    self.calls.append(call)
+                    replayed += 1
+            self._generation = generation
+            return replayed
         except Exception as e:
-            logger.error(f"Failed to save metrics: {e}")
+            logger.error(f"Failed to replay call log: {e}")
+            return None
+    
+    # The methods below touching files run on the I/O thread only
+    
+    def _open_log(self):
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        self._log_file = open(self.log_path, 'a')
+    
+    def _start_log(self, generation: int):
+        """Truncate the call log and write the header for a new generation"""
+        self._close_log()
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with open(self.log_path, 'w') as f:
+            f.write(json.dumps({"generation": generation}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._open_log()
+    
+    def _write_batch(self, batch: List[Dict]) -> bool:
+        """Append a group of calls to the log - one write, one fsync"""
+        try:
+            if self._log_file is None:
+                self._open_log()
+            self._log_file.write("".join(json.dumps(call, separators=(",", ":")) + "\n" for call in batch))
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
+            return True
+        except Exception as e:
+            logger.error(f"Failed to append {len(batch)} calls to log: {e}")
+            return False
+    
+    def _write_snapshot(self, calls: List[Dict], generation: int, last_seq: int = 0, rollups: Optional[Dict] = None):
+        """Write the snapshot covering `generation`, then start the next log"""
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        tmp_path = self.data_path + ".tmp"
+        snapshot = {"generation": generation, "last_seq": last_seq, "calls": calls}
+        if rollups is not None:
+            snapshot["rollups"] = rollups  # restored on load instead of recounting every call
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.data_path)
+        self._start_log(generation + 1)
+    
+    def _close_log(self):
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
+    
+    # Group commit, on the event loop
+    
+    def _queue_write(self, call_record: Dict) -> asyncio.Future:
+        """Add a call to the pending batch, returning the future for its commit"""
+        if self._batch is None:
+            loop = asyncio.get_running_loop()
+            self._batch = []
+            self._batch_done = loop.create_future()
+            self._commit_timer = loop.call_later(self.commit_window, self._commit)
+        self._batch.append(call_record)
+        done = self._batch_done
+        if len(self._batch) >= self.commit_batch:
+            self._commit()
+        return done
+    
+    def _commit(self):
+        """Hand the pending batch to the I/O thread"""
+        if self._batch is None:
+            return
+        batch, done = self._batch, self._batch_done
+        self._batch = self._batch_done = None
+        self._commit_timer.cancel()
+        
+        def resolve(written: asyncio.Future):
+            # Waiters get whether the batch made it to disk
+            if not done.done():
+                done.set_result(not written.cancelled() and written.exception() is None and written.result())
+        
+        written = asyncio.wrap_future(self._io.submit(self._write_batch, batch))
+        written.add_done_callback(resolve)
+        self._last_commit = written
+    
+    async def flush(self):
+        """Commit anything pending and wait until every logged call is on disk"""
+        self._commit()
+        if self._last_commit is not None:
+            await asyncio.shield(self._last_commit)
+    
+    async def save(self):
+        """Compact: write a full snapshot and start a new, empty call log"""
+        if self.state is not None:
+            return  # the shared call log is the record - there is no snapshot to write
+        await asyncio.shield(self._request_save())
+    
+    def _request_save(self) -> asyncio.Future:
+        """Queue a compaction - everyone asking while one is still queued shares it"""
+        if self._queued_save is None:
+            self._queued_save = asyncio.ensure_future(self._compact())
+        return self._queued_save
+    
+    async def _compact(self):
+        async with self._save_lock:
+            self._queued_save = None  # later requests need a snapshot that includes their calls
+            # Copy on the loop, then write on the I/O thread. Calls committed
+            # before this land in the current log, later ones in the next.
+            self._commit()
+            calls = list(self.calls)
+            rollups = self.rollups.to_dict()
+            generation = self._generation
+            self._generation += 1
+            self._log_entries = 0
+            try:
+                await self._io.run(self._write_snapshot, calls, generation, self._last_seq, rollups)
+                logger.info(f"Saved {len(calls)} call records")
+            except Exception as e:
+                logger.error(f"Failed to save metrics: {e}")
+    
+    def close(self):
+        """Flush and close the call log once everything queued is written"""
+        self._io.submit(self._close_log)
+        self._io.shutdown()
     
     async def log_call(
         self,
@@ -50,9 +486,10 @@ class MetricsService:
         agreed_rate: Optional[float] = None,
         negotiation_rounds: int = 0,
         call_duration_seconds: Optional[int] = None,
-        notes: Optional[str] = None
+        notes: Optional[str] = None,
+        durable: bool = False
     ):
-        """Log a completed call"""
+        """Log a completed call (durable=True waits until it is on disk, raising if it can't be)"""
         call_record = {
             "call_id": call_id,
             "mc_number": mc_number,
@@ -67,68 +504,314 @@ class MetricsService:
             "timestamp": datetime.now().isoformat()
         }
         
-        self.calls.append(call_record)
-        await self.save()
+        committed = await self._record(call_record, durable)
+        if durable and committed is not None and not await asyncio.shield(committed):
+            raise OSError(f"Call {call_id} could not be written to {self.log_path}")
         
         logger.info(f"Logged call {call_id}: outcome={outcome}, sentiment={sentiment}")
         
         return call_record
     
+    async def _record(self, call_record: Dict, durable: bool = False) -> Optional[asyncio.Future]:
+        """Store a new call, returning the future for its group commit (if it has one)"""
+        if self.state is not None:
+            # Our call comes back through sync along with anyone else's; a
+            # durable one is fsynced before append_call returns
+            call_record["seq"] = await self.state.run(self.state.append_call, call_record, durable)
+            await self.sync()
+            return None
+        
+        call_record["seq"] = self._last_seq + 1
+        self._insert(call_record)
+        committed = self._queue_write(call_record)
+        self._log_entries += 1
+        if self._log_entries >= self.compact_every:
+            self._request_save()  # in the background - this call is already logged
+        return committed
+    
+    async def etag(self) -> str:
+        """Strong ETag for get_metrics - checking it computes nothing"""
+        await self.sync()
+        return f'"{self._epoch}-{self.version}"'
+    
     async def get_metrics(self) -> Dict:
         """Get aggregated metrics for dashboard"""
-        if not self.calls:
-            return {
-                "total_calls": 0,
-                "successful_bookings": 0,
-                "success_rate": 0.0,
-                "avg_negotiation_rounds": 0.0,
-                "total_booked_value": 0.0,
-                "calls_by_outcome": {},
-                "sentiment_breakdown": {},
-                "recent_calls": []
-            }
-        
-        # Calculate metrics
+        metrics = await self.get_counters()
+        # Calls are kept in time order - the newest window, most recent first
+        metrics["recent_calls"] = self.calls[-self.recent_limit:][::-1]
+        return metrics
+    
+    async def get_counters(self) -> Dict:
+        """get_metrics without recent_calls (what dashboard metrics events carry)"""
+        await self.sync()
+        
+        # All derived from running counters - no pass over the call history
         total_calls = len(self.calls)
-        successful = [c for c in self.calls if c["outcome"] == "booked"]
-        successful_count = len(successful)
+        successful_count = self._successful_count
         success_rate = (successful_count / total_calls * 100) if total_calls > 0 else 0.0
         
         # Average negotiation rounds (only for booked calls)
-        if successful:
-            avg_rounds = sum(c.get("negotiation_rounds", 0) for c in successful) / len(successful)
-        else:
-            avg_rounds = 0.0
+        avg_rounds = self._booked_rounds / successful_count if successful_count else 0.0
+        
+        return {
+            "total_calls": total_calls,
+            "successful_bookings": successful_count,
+            "success_rate": round(success_rate, 1),
+            "avg_negotiation_rounds": round(avg_rounds, 1),
+            "total_booked_value": round(self._booked_value, 2),
+            "calls_by_outcome": dict(self._outcomes),
+            "sentiment_breakdown": dict(self._sentiments)
+        }
+    
+    async def get_call_history(self, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """
+        Page through call history, most recent first
         
-        # Total booked value (sum of all agreed rates for booked loads)
-        total_booked_value = sum(c.get("agreed_rate", 0) or 0 for c in successful)
+        `cursor` is the `next_cursor` of the previous page ("timestamp|call_id"
+        of the oldest call it returned). Finding the page start is a binary
+        search over the time-ordered history, so no page fetch sorts anything.
+        """
+        await self.sync()
+        end = len(self.calls)
+        if cursor:
+            timestamp, _, call_id = cursor.partition("|")
+            end = bisect.bisect_left(self.calls, (timestamp, call_id), key=self._order_key)
         
-        # Breakdown by outcome
-        outcomes = {}
-        for call in self.calls:
-            outcome = call.get("outcome", "unknown")
-            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        start = max(0, end - limit)
+        page = self.calls[start:end][::-1]
         
-        # Breakdown by sentiment
-        sentiments = {}
-        for call in self.calls:
-            sentiment = call.get("sentiment", "neutral")
-            sentiments[sentiment] = sentiments.get(sentiment, 0) + 1
+        next_cursor = None
+        if start > 0 and page:
+            timestamp, call_id = self._order_key(page[-1])
+            next_cursor = f"{timestamp}|{call_id}"
         
-        # All calls sorted by most recent
-        recent = sorted(self.calls, key=lambda x: x["timestamp"], reverse=True)
+        return {
+            "calls": page,
+            "next_cursor": next_cursor,
+            "total_calls": len(self.calls)
+        }
+    
+    async def get_calls_since(self, seq: int = 0, limit: int = 500) -> Dict:
+        """
+        Calls logged after `seq`, in seq order - a client mirroring the
+        history pulls only what's new
         
+        Seqs only ever grow, across resets and restarts. A mirror holding
+        more calls than `total_calls` missed a reset - start over from seq 0.
+        """
+        await self.sync()
+        start = bisect.bisect_right(self._by_seq, seq, key=self._seq_key)
+        calls = self._by_seq[start:start + limit]
         return {
+            "calls": calls,
+            "last_seq": calls[-1]["seq"] if calls else seq,
+            "has_more": start + limit < len(self._by_seq),
+            "total_calls": len(self.calls)
+        }
+    
+    async def get_rollups(self, granularity: str, start: str, end: str) -> Dict:
+        """Hourly or daily buckets from `start` to `end` (ISO timestamps), oldest first"""
+        await self.sync()
+        return {
+            "granularity": granularity,
+            "start": start,
+            "end": end,
+            "buckets": self.rollups.range(granularity, start, end)
+        }
+    
+    async def reset(self):
+        """Clear all call history and counters"""
+        if self.state is not None:
+            await self.state.run(self.state.clear_calls)
+            await self.sync()
+            return
+        self.calls = []
+        self._by_seq = []
+        self._reset_aggregates()
+        self._publish("calls_cleared")
+        await self.save()
+    
+    async def log_verification(self, mc_number: str, eligible: bool):
+        """Log a carrier verification (for debugging)"""
+        logger.info(f"Verification: MC {mc_number} - Eligible: {eligible}")
+
+
+class SQLiteMetricsService(MetricsService):
+    """
+    MetricsService on the SQLite storage engine (STORAGE_BACKEND=sqlite)
+    
+    Calls are rows in an indexed table instead of a list in memory:
+    get_metrics aggregates in SQL (cached until the table changes) and
+    history pages are keyset queries on (timestamp, call_id). Every worker
+    process reads and writes the same table, so no shared state backend
+    is needed for calls.
+    """
+    
+    def __init__(self, data_path: str = "data/metrics.json", store=None, **options):
+        options.pop("state", None)  # the table is already shared
+        super().__init__(data_path, **options)
+        self.store = store
+        self._writes = 0  # our own commits - data_version only counts other connections'
+        self._totals: Optional[tuple] = None  # (table version, metrics without recent_calls)
+        self._table_version: Optional[tuple] = None  # as of the last etag() - any change bumps self.version
+        self._calls_seq = 0  # last call pushed to dashboards
+    
+    def _load(self):
+        """Import metrics.json and its call log the first time the store is used"""
+        if not self.store.calls_imported():
+            self._replay_log(self._read_snapshot())
+            if self.store.import_calls(self.calls):
+                logger.info(f"Imported {len(self.calls)} call records from {self.data_path} into {self.store.path}")
+            self.calls = []
+        if not self.store.rollups_built():
+            self.store.build_rollups()  # stores from before rollups, and fresh imports
+        self._calls_seq = self.store.last_call_seq()
+        logger.info(f"Call records in {self.store.path}: {self._read_totals()['total_calls']}")
+    
+    async def _record(self, call_record: Dict, durable: bool = False) -> None:
+        # Committed at once, like the shared state backend's call log, so every
+        # worker sees the call as soon as it is logged. WAL commits at
+        # synchronous=NORMAL don't fsync, which leaves little to group; a
+        # durable call commits at FULL and is fsynced before this returns.
+        await self.store.run(self.store.append_calls, [call_record], durable)
+        self._writes += 1
+        await self.sync()
+    
+    async def sync(self):
+        """Push calls logged since the last sync (ours and other workers') to dashboards"""
+        async with self._sync_lock:
+            if self.events is None or not self.events.subscribers:
+                self._calls_seq = await self.store.run(self.store.last_call_seq)  # nobody is watching - skip ahead
+                return
+            for call in await self.store.run(self.store.calls_after, self._calls_seq):
+                self._calls_seq = call["seq"]
+                self._publish("call", call)
+    
+    def _read_version(self) -> int:
+        """self.version, bumped if the table changed (here or in another worker) since last asked (blocking)"""
+        table_version = (self.store.data_version(), self._writes)
+        if table_version != self._table_version:
+            self._table_version = table_version
+            self.version += 1
+        return self.version
+    
+    async def etag(self) -> str:
+        return f'"{self._epoch}-{await run_blocking(self._read_version)}"'
+    
+    def _read_totals(self) -> Dict:
+        """get_metrics minus recent_calls, recomputed only when the table has changed (blocking)"""
+        version = (self.store.data_version(), self._writes)
+        if self._totals is not None and self._totals[0] == version:
+            return self._totals[1]
+        
+        total_calls = successful_count = booked_rounds = 0
+        booked_value = 0.0
+        outcomes: Dict[str, int] = {}
+        sentiments: Dict[str, int] = {}
+        # Groups come oldest first, so both breakdowns keep first-seen order
+        for outcome, sentiment, calls, rounds, value, _ in self.store.call_totals():
+            total_calls += calls
+            outcomes[outcome] = outcomes.get(outcome, 0) + calls
+            sentiments[sentiment] = sentiments.get(sentiment, 0) + calls
+            if outcome == "booked":
+                successful_count += calls
+                booked_rounds += rounds
+                booked_value += value
+        
+        totals = {
             "total_calls": total_calls,
             "successful_bookings": successful_count,
-            "success_rate": round(success_rate, 1),
-            "avg_negotiation_rounds": round(avg_rounds, 1),
-            "total_booked_value": round(total_booked_value, 2),
+            "success_rate": round(successful_count / total_calls * 100, 1) if total_calls else 0.0,
+            "avg_negotiation_rounds": round(booked_rounds / successful_count, 1) if successful_count else 0.0,
+            "total_booked_value": round(booked_value, 2),
             "calls_by_outcome": outcomes,
-            "sentiment_breakdown": sentiments,
-            "recent_calls": recent
+            "sentiment_breakdown": sentiments
         }
+        self._totals = (version, totals)
+        return totals
     
-    async def log_verification(self, mc_number: str, eligible: bool):
-        """Log a carrier verification (for debugging)"""
-        logger.info(f"Verification: MC {mc_number} - Eligible: {eligible}")
\ No newline at end of file
+    def _read_counters(self) -> Dict:
+        totals = self._read_totals()
+        return dict(
+            totals,
+            calls_by_outcome=dict(totals["calls_by_outcome"]),
+            sentiment_breakdown=dict(totals["sentiment_breakdown"])
+        )
+    
+    def _read_metrics(self) -> Dict:
+        metrics = self._read_counters()
+        metrics["recent_calls"] = self.store.recent_calls(self.recent_limit) if metrics["total_calls"] else []
+        return metrics
+    
+    async def get_metrics(self) -> Dict:
+        """Get aggregated metrics for dashboard"""
+        return await run_blocking(self._read_metrics)
+    
+    async def get_counters(self) -> Dict:
+        return await run_blocking(self._read_counters)
+    
+    def _read_page(self, limit: int, cursor: Optional[str]) -> Dict:
+        before = None
+        if cursor:
+            timestamp, _, call_id = cursor.partition("|")
+            before = (timestamp, call_id)
+        # One extra row says whether there is an older page
+        calls = self.store.recent_calls(limit + 1, before) if limit > 0 else []
+        page = calls[:limit]
+        
+        next_cursor = None
+        if len(calls) > limit and page:
+            timestamp, call_id = self._order_key(page[-1])
+            next_cursor = f"{timestamp}|{call_id}"
+        
+        return {
+            "calls": page,
+            "next_cursor": next_cursor,
+            "total_calls": self._read_totals()["total_calls"]
+        }
+    
+    async def get_call_history(self, limit: int = 50, cursor: Optional[str] = None) -> Dict:
+        """Page through call history, most recent first (see MetricsService.get_call_history)"""
+        return await run_blocking(self._read_page, limit, cursor)
+    
+    def _read_since(self, seq: int, limit: int) -> Dict:
+        # One extra row says whether there is more
+        calls = self.store.calls_after(seq, limit + 1)
+        page = calls[:limit]
+        return {
+            "calls": page,
+            "last_seq": page[-1]["seq"] if page else seq,
+            "has_more": len(calls) > limit,
+            "total_calls": self._read_totals()["total_calls"]
+        }
+    
+    async def get_calls_since(self, seq: int = 0, limit: int = 500) -> Dict:
+        """Calls logged after `seq`, in seq order (see MetricsService.get_calls_since)"""
+        return await run_blocking(self._read_since, seq, limit)
+    
+    def _read_rollups(self, granularity: str, start: str, end: str) -> List[Dict]:
+        # Rows are per (bucket, outcome, sentiment) - fold them into buckets
+        rollups = CallRollups()
+        for bucket, *totals in self.store.call_rollups(granularity, start, end):
+            rollups.add_totals(granularity, bucket, *totals)
+        return rollups.range(granularity, start, end)
+    
+    async def get_rollups(self, granularity: str, start: str, end: str) -> Dict:
+        return {
+            "granularity": granularity,
+            "start": start,
+            "end": end,
+            "buckets": await run_blocking(self._read_rollups, granularity, start, end)
+        }
+    
+    def _clear(self):
+        self.store.clear_calls()
+        self._writes += 1
+    
+    async def reset(self):
+        """Clear all call history and counters"""
+        await run_blocking(self._clear)
+        self._publish("calls_cleared")
+    
+    async def save(self):
+        pass  # every call is committed to the store as it is logged
@@ -0,0 +1,93 @@
+import math
+import time
+from typing import Dict, Hashable, Optional, Tuple
+import logging
+
+from .state import MemoryStateBackend
+
+logger = logging.getLogger(__name__)
+
+
+def parse_limits(spec: Optional[str]) -> Dict[str, int]:
+    """Parse "name=limit,name=limit" (e.g. from an env var) into a dict"""
+    limits = {}
+    for item in (spec or "").split(","):
+        name, _, limit = item.strip().rpartition("=")
+        if name and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+class SlidingWindowRateLimiter:
+    """
+    Sliding-window-counter rate limiter with O(1) memory and work per key
+    
+    Each bucket keeps only two counters: requests in the current fixed window
+    and in the previous one. The sliding count is the current count plus the
+    previous count weighted by how much of the previous window still overlaps
+    the last `window` seconds. Uses monotonic time, so wall-clock changes
+    don't reset anyone's limit.
+    
+    Limits can be set per route (each route then gets its own bucket per
+    key) and per API key; everything else shares the default limit. Buckets
+    idle for two full windows are evicted, at most one sweep per window.
+    Counters are kept by the state backend (in memory by default).
+    """
+    
+    def __init__(
+        self,
+        default_limit: int = 60,
+        window: float = 60.0,
+        route_limits: Optional[Dict[str, int]] = None,
+        key_limits: Optional[Dict[str, int]] = None,
+        state=None
+    ):
+        self.default_limit = default_limit
+        self.window = window
+        self.route_limits = route_limits or {}
+        self.key_limits = key_limits or {}
+        # Counters live in the state backend, so workers sharing one see each other's requests
+        self.state = state if state is not None else MemoryStateBackend()
+        self._last_sweep = 0
+        self.rejected = 0
+    
+    def _limit_for(self, key: str, route: Optional[str]) -> Tuple[Hashable, int]:
+        """The bucket a request counts against, and that bucket's limit"""
+        if route is not None and route in self.route_limits:
+            return (key, route), self.route_limits[route]
+        return (key, None), self.key_limits.get(key, self.default_limit)
+    
+    async def hit(self, key: str, route: Optional[str] = None) -> Tuple[bool, float]:
+        """
+        Count a request, returning (allowed, retry_after_seconds)
+        
+        Rejected requests are not counted, so a client that backs off
+        recovers as the window slides.
+        """
+        now = time.monotonic()
+        index = int(now // self.window)
+        await self._maybe_sweep(index)
+        
+        bucket_key, limit = self._limit_for(key, route)
+        elapsed = (now % self.window) / self.window
+        if not await self.state.run(self.state.window_hit, bucket_key, index, elapsed, limit):
+            self.rejected += 1
+            return False, math.ceil(self.window * (1 - elapsed))
+        return True, 0.0
+    
+    async def _maybe_sweep(self, index: int):
+        """Evict buckets idle for two full windows (amortized: once per window)"""
+        if index == self._last_sweep:
+            return
+        self._last_sweep = index
+        evicted = await self.state.run(self.state.sweep_windows, index)
+        if evicted:
+            logger.debug(f"Evicted {evicted} idle rate-limit buckets")
+    
+    async def stats(self) -> Dict:
+        return {
+            "buckets": await self.state.run(self.state.window_buckets),
+            "rejected": self.rejected,
+            "default_limit": self.default_limit,
+            "window_seconds": self.window
+        }
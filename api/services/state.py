@@ -0,0 +1,433 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+import logging
+
+from .storage import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+# (generation, last seq seen) - what a process has already applied from a shared log
+Cursor = Tuple[int, int]
+
+
+def read_jsonl(f: BinaryIO, path: str) -> Iterator[Dict]:
+    """
+    Records of an append-only JSONL file opened 'rb+', from where `f` is
+    
+    A torn final write from a crash is truncated away, keeping everything
+    before it.
+    """
+    good_offset = f.tell()
+    for line in iter(f.readline, b""):
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"Dropping truncated record at end of {path}")
+            f.truncate(good_offset)
+            return
+        yield record
+        good_offset = f.tell()
+
+
+class BookingJournal:
+    """
+    Append-only JSONL journal of booking changes
+    
+    Records are handed to a writer thread, which writes whatever has queued
+    up and fsyncs once per batch, so a booking costs the event loop one
+    queue put. A "clear" truncates the journal, so replay at startup only
+    ever reads the bookings since the last reset.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+    
+    def replay(self) -> List[str]:
+        """Booked load IDs, in booking order, as of the end of the journal"""
+        booked: Dict[str, None] = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'rb+') as f:
+            for record in read_jsonl(f, self.path):
+                if record.get("op") == "clear":
+                    booked.clear()
+                elif record.get("op") == "unbook":
+                    booked.pop(record["load_id"], None)
+                else:
+                    booked[record["load_id"]] = None
+        logger.info(f"Replayed {len(booked)} bookings from {self.path}")
+        return list(booked)
+    
+    def append(self, record: Dict) -> Future:
+        """Queue a record; the future resolves once it is fsynced"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="booking-journal", daemon=True)
+            self._thread.start()
+        future = Future()
+        self._queue.put((record, future))
+        return future
+    
+    def _run(self):
+        f = None
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            
+            try:
+                if f is None:
+                    # Opened here, so a failure fails this batch instead of killing the writer
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    f = open(self.path, 'a')
+                for record, _ in batch:
+                    if record.get("op") == "clear":
+                        f.flush()
+                        f.truncate(0)
+                    else:
+                        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception as e:
+                logger.error(f"Failed to write booking journal: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for _, future in batch:
+                future.set_result(None)
+        if f is not None:
+            f.close()
+    
+    def close(self):
+        """Write out everything queued and stop the writer"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+
+class MemoryStateBackend:
+    """
+    Booking and rate-limit state for a single process (the default)
+    
+    Nothing is shared: a second worker process would get its own copy, so
+    this is only safe with one uvicorn worker. The call log stays with
+    MetricsService's own snapshot + log files. With a journal path,
+    bookings are journaled and survive restarts; the journal is replayed
+    by open() at startup (or the first time bookings are touched).
+    """
+    
+    shared = False
+    
+    def __init__(self, journal_path: Optional[str] = None):
+        self._booked: Set[str] = set()
+        self._booking_log: List[str] = []  # booking order, read by bookings_since
+        self._booking_generation = 0
+        # rate-limit bucket -> [window index, count in that window, count in the window before]
+        self._windows: Dict[Hashable, list] = {}
+        self._journal = BookingJournal(journal_path) if journal_path else None
+        self._booking_writes: Dict[str, Future] = {}  # load_id -> its journal write, until flushed
+        self._replayed = self._journal is None
+    
+    def open(self):
+        """Replay the booking journal (blocking) - lifespan calls this, so a bad journal fails startup"""
+        if self._replayed:
+            return
+        try:
+            self._booking_log = self._journal.replay()
+        except OSError as e:
+            # Starting empty would offer every journaled load again - refuse to start instead
+            raise RuntimeError(f"Can't read booking journal {self._journal.path}: {e}") from e
+        self._booked = set(self._booking_log)
+        self._replayed = True
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call one of our methods - in-process dicts, so straight on the event loop"""
+        return fn(*args, **kwargs)
+    
+    def book(self, load_id: str) -> bool:
+        """Book a load if nobody has yet - True only for the winner"""
+        self.open()
+        if load_id in self._booked:
+            return False
+        self._booked.add(load_id)
+        self._booking_log.append(load_id)
+        write = self._journal_write({"op": "book", "load_id": load_id, "booked_at": datetime.now().isoformat()})
+        if write is not None:
+            self._booking_writes[load_id] = write
+        return True
+    
+    def unbook(self, load_id: str) -> bool:
+        """Release a booking that couldn't be confirmed - True if it was booked"""
+        self.open()
+        if load_id not in self._booked:
+            return False
+        self._booked.discard(load_id)
+        self._booking_log.remove(load_id)
+        self._booking_generation += 1  # positions shifted - readers start over
+        self._booking_writes.pop(load_id, None)
+        write = self._journal_write({"op": "unbook", "load_id": load_id})
+        if write is not None:
+            self._booking_writes[load_id] = write
+        return True
+    
+    def clear_bookings(self):
+        self.open()
+        self._booked.clear()
+        self._booking_log = []
+        self._booking_generation += 1
+        self._journal_write({"op": "clear"})
+    
+    def _journal_write(self, record: Dict) -> Optional[Future]:
+        if self._journal:
+            return self._journal.append(record)
+        return None
+    
+    async def flush(self, load_id: str):
+        """Wait until this booking (or unbooking) is on disk - its own write, whatever else fails or succeeds"""
+        write = self._booking_writes.pop(load_id, None)
+        if write is not None:
+            await asyncio.wrap_future(write)
+    
+    def bookings_since(self, cursor: Cursor) -> Tuple[Cursor, bool, List[str]]:
+        """Bookings after `cursor`; reset=True means start over from the full list"""
+        self.open()
+        generation, seq = cursor
+        reset = generation != self._booking_generation
+        if reset:
+            seq = 0
+        return (self._booking_generation, len(self._booking_log)), reset, self._booking_log[seq:]
+    
+    def window_hit(self, bucket_key: Hashable, index: int, elapsed: float, limit: int) -> bool:
+        """
+        Count a request against a sliding-window counter if it is under `limit`
+        
+        `index` is the current fixed window and `elapsed` how far into it we
+        are (0-1); the previous window's count is weighted by the overlap.
+        """
+        bucket = self._windows.get(bucket_key)
+        if bucket is None:
+            bucket = self._windows[bucket_key] = [index, 0, 0]
+        elif bucket[0] != index:
+            # Roll forward: the old current window becomes "previous" only if adjacent
+            bucket[2] = bucket[1] if bucket[0] == index - 1 else 0
+            bucket[1] = 0
+            bucket[0] = index
+        
+        if bucket[2] * (1 - elapsed) + bucket[1] >= limit:
+            return False
+        bucket[1] += 1
+        return True
+    
+    def sweep_windows(self, index: int) -> int:
+        """Drop counters idle since before the previous window"""
+        idle = [bucket_key for bucket_key, bucket in self._windows.items() if bucket[0] < index - 1]
+        for bucket_key in idle:
+            del self._windows[bucket_key]
+        return len(idle)
+    
+    def window_buckets(self) -> int:
+        return len(self._windows)
+    
+    def close(self):
+        if self._journal:
+            self._journal.close()
+
+
+class SQLiteStateBackend(SQLiteDatabase):
+    """
+    Booking, rate-limit and call-log state in one SQLite file (WAL mode)
+    
+    Every worker process on the host opens the same file, so bookings are
+    won exactly once, rate limits count across workers and every worker
+    sees every call. Each process keeps its in-memory view and catches up
+    by reading log rows past its cursor; clearing a log bumps its
+    generation so other processes know to start over. SQLite locks the
+    file, not the host - this does not span Fly machines.
+    
+    Every method blocks (on another worker's write lock, at worst for the
+    busy timeout), so callers on the event loop go through run().
+    """
+    
+    shared = True
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS bookings (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            load_id TEXT NOT NULL UNIQUE,
+            booked_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS calls (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            call TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rate_windows (
+            bucket TEXT NOT NULL,
+            window INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (bucket, window)
+        ) WITHOUT ROWID;
+    """
+    
+    def open(self):
+        """Open the database now (blocking), so a bad path fails startup rather than the first request"""
+        with self._lock:
+            self._connection()
+    
+    @staticmethod
+    def _generation(conn: sqlite3.Connection, name: str) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (name,)).fetchone()
+        return row[0] if row else 0
+    
+    def _read_since(self, table: str, column: str, cursor: Cursor) -> Tuple[Cursor, bool, List[Tuple[int, str]]]:
+        """Rows of a log table after `cursor`, read from one consistent snapshot"""
+        generation, seq = cursor
+        with self._transaction(write=False) as conn:
+            current = self._generation(conn, f"{table}_generation")
+            reset = current != generation
+            if reset:
+                seq = 0
+            rows = conn.execute(
+                f"SELECT seq, {column} FROM {table} WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        last_seq = rows[-1][0] if rows else seq
+        return (current, last_seq), reset, rows
+    
+    def _clear(self, table: str, durable: bool = False):
+        with self._transaction(durable=durable) as conn:
+            conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+                (f"{table}_generation",)
+            )
+    
+    # Bookings
+    
+    def book(self, load_id: str) -> bool:
+        """
+        Book a load if nobody has yet - the UNIQUE insert makes this atomic across processes
+        
+        Committed durably: a booking is a promise to a carrier, so it must
+        survive a power loss. Other writes (rate limits, calls other than
+        the booked call itself) stay at synchronous=NORMAL.
+        """
+        with self._transaction(durable=True) as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO bookings (load_id, booked_at) VALUES (?, ?)",
+                (load_id, datetime.now().isoformat())
+            )
+            return cursor.rowcount == 1
+    
+    def unbook(self, load_id: str) -> bool:
+        """Release a booking that couldn't be confirmed; other processes start over from the new generation"""
+        with self._transaction(durable=True) as conn:
+            if conn.execute("DELETE FROM bookings WHERE load_id = ?", (load_id,)).rowcount == 0:
+                return False
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('bookings_generation', 1) "
+                "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+            )
+        return True
+    
+    def clear_bookings(self):
+        self._clear("bookings", durable=True)
+    
+    def bookings_since(self, cursor: Cursor) -> Tuple[Cursor, bool, List[str]]:
+        cursor, reset, rows = self._read_since("bookings", "load_id", cursor)
+        return cursor, reset, [load_id for _, load_id in rows]
+    
+    async def flush(self, load_id: str):
+        pass  # book() commits durably itself
+    
+    # Call log
+    
+    def append_call(self, call: Dict, durable: bool = False) -> int:
+        """Append to the shared call log; durable=True commits at synchronous=FULL (booked calls)"""
+        with self._transaction(durable=durable) as conn:
+            cursor = conn.execute(
+                "INSERT INTO calls (call) VALUES (?)", (json.dumps(call, separators=(",", ":")),)
+            )
+            return cursor.lastrowid
+    
+    def clear_calls(self):
+        self._clear("calls")
+    
+    def calls_since(self, cursor: Cursor) -> Tuple[Cursor, bool, List[Dict]]:
+        cursor, reset, rows = self._read_since("calls", "call", cursor)
+        # The row's seq is the call's sequence number, the same in every worker
+        return cursor, reset, [dict(json.loads(call), seq=seq) for seq, call in rows]
+    
+    def seed_calls(self, calls: List[Dict]) -> bool:
+        """Import existing calls once (the first worker to start wins), returning whether it did"""
+        with self._transaction() as conn:
+            if self._generation(conn, "calls_seeded") or conn.execute("SELECT 1 FROM calls LIMIT 1").fetchone():
+                return False
+            conn.executemany(
+                "INSERT INTO calls (call) VALUES (?)",
+                [(json.dumps(call, separators=(",", ":")),) for call in calls]
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('calls_seeded', 1)")
+        return True
+    
+    # Rate-limit counters
+    
+    @staticmethod
+    def _bucket_name(bucket_key: Hashable) -> str:
+        # Buckets are keyed by API key - don't write raw keys to disk
+        return hashlib.sha256(repr(bucket_key).encode()).hexdigest()[:32]
+    
+    def window_hit(self, bucket_key: Hashable, index: int, elapsed: float, limit: int) -> bool:
+        """Same sliding-window counter as the memory backend, in one write transaction"""
+        bucket = self._bucket_name(bucket_key)
+        with self._transaction() as conn:
+            counts = dict(conn.execute(
+                "SELECT window, count FROM rate_windows WHERE bucket = ? AND window >= ?",
+                (bucket, index - 1)
+            ).fetchall())
+            if counts.get(index - 1, 0) * (1 - elapsed) + counts.get(index, 0) >= limit:
+                return False
+            conn.execute(
+                "INSERT INTO rate_windows (bucket, window, count) VALUES (?, ?, 1) "
+                "ON CONFLICT(bucket, window) DO UPDATE SET count = count + 1",
+                (bucket, index)
+            )
+        return True
+    
+    def sweep_windows(self, index: int) -> int:
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM rate_windows WHERE window < ?", (index - 1,)).rowcount
+    
+    def window_buckets(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(DISTINCT bucket) FROM rate_windows").fetchone()[0]
+
+
+def create_state_backend(
+    kind: str = "memory",
+    path: Optional[str] = None,
+    journal_path: Optional[str] = None
+):
+    """Build the backend named by STATE_BACKEND ("memory" or "sqlite")"""
+    if kind == "sqlite":
+        return SQLiteStateBackend(path or "data/state.db")
+    if kind != "memory":
+        logger.warning(f"Unknown state backend {kind!r}, using memory")
+    return MemoryStateBackend(journal_path=journal_path)
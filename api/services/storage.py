@@ -0,0 +1,453 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import logging
+
+from .io_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteDatabase:
+    """
+    One SQLite file in WAL mode, reused by every thread of a process
+    
+    Each process keeps a single connection, opened lazily (and again after
+    a fork, since connections don't survive one) and guarded by a lock so
+    the event loop and I/O threads can share it.
+    """
+    
+    SCHEMA = ""
+    
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._lock = threading.Lock()
+    
+    def _connection(self) -> sqlite3.Connection:
+        """Open lazily, and again in a forked worker (connections don't survive fork)"""
+        if self._conn is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,  # explicit transactions only
+                check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; never corrupt
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+            self._pid = os.getpid()
+            logger.info(f"Opened {self.path}")
+        return self._conn
+    
+    @contextmanager
+    def _transaction(self, write: bool = True, durable: bool = False):
+        """
+        BEGIN IMMEDIATE takes the write lock up front, so check-then-write is atomic
+        
+        A durable transaction commits at synchronous=FULL: the WAL is fsynced
+        before COMMIT returns, taking every earlier commit with it.
+        """
+        with self._lock:
+            conn = self._connection()
+            if durable:
+                conn.execute("PRAGMA synchronous=FULL")
+            try:
+                conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            finally:
+                if durable:
+                    conn.execute("PRAGMA synchronous=NORMAL")
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call one of our methods on the I/O pool - they can wait on another process's lock"""
+        return await run_blocking(fn, *args, **kwargs)
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+class SQLiteStore(SQLiteDatabase):
+    """
+    Loads and call records as indexed SQLite tables (STORAGE_BACKEND=sqlite)
+    
+    The storage engine behind SQLiteLoadService and SQLiteMetricsService.
+    Loads are split in two tables: the normalized search keys (lowercased
+    city/state and equipment, pickup date, rate), and the original record
+    with its two pre-encoded HappyRobot payloads. Call rows carry the columns metrics
+    aggregate on next to the original record. The JSON files are imported
+    on startup - loads whenever loads.json changes, calls once.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS storage_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS loads (
+            load_id TEXT NOT NULL UNIQUE,
+            origin_city TEXT NOT NULL,
+            origin_state TEXT NOT NULL,
+            destination_city TEXT NOT NULL,
+            destination_state TEXT NOT NULL,
+            equipment_type TEXT NOT NULL,
+            pickup_date TEXT NOT NULL,
+            loadboard_rate REAL NOT NULL,
+            PRIMARY KEY (loadboard_rate DESC, load_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS load_records (
+            load_id TEXT PRIMARY KEY,
+            load TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            booked_payload BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS loads_origin_city ON loads (origin_city);
+        CREATE INDEX IF NOT EXISTS loads_origin_state ON loads (origin_state);
+        CREATE INDEX IF NOT EXISTS loads_destination_city ON loads (destination_city);
+        CREATE INDEX IF NOT EXISTS loads_destination_state ON loads (destination_state);
+        CREATE INDEX IF NOT EXISTS loads_equipment_type ON loads (equipment_type);
+        CREATE INDEX IF NOT EXISTS loads_pickup_date ON loads (pickup_date);
+        CREATE TABLE IF NOT EXISTS call_records (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            call_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            negotiation_rounds INTEGER NOT NULL,
+            agreed_rate REAL NOT NULL,
+            call TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS call_records_time ON call_records (timestamp, call_id);
+        CREATE INDEX IF NOT EXISTS call_records_outcome ON call_records (outcome, sentiment);
+        CREATE TABLE IF NOT EXISTS call_rollups (
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            outcome TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            calls INTEGER NOT NULL,
+            negotiation_rounds INTEGER NOT NULL,
+            agreed_value REAL NOT NULL,
+            call_duration_seconds INTEGER NOT NULL,
+            timed_calls INTEGER NOT NULL,
+            PRIMARY KEY (granularity, bucket, outcome, sentiment)
+        ) WITHOUT ROWID;
+    """
+    
+    # A load row is KEY_COLUMNS + RECORD_COLUMNS. The key table is clustered
+    # best paying first, and every index on it carries that order, so a
+    # search walks matches in rate order and stops; records (payload blobs)
+    # are only read for the hits.
+    KEY_COLUMNS = (
+        "load_id", "origin_city", "origin_state", "destination_city", "destination_state",
+        "equipment_type", "pickup_date", "loadboard_rate"
+    )
+    RECORD_COLUMNS = ("load", "payload", "booked_payload")
+    
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM storage_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: str):
+        conn.execute("INSERT OR REPLACE INTO storage_meta (key, value) VALUES (?, ?)", (key, value))
+    
+    def data_version(self) -> int:
+        """Changes whenever another connection (another worker) commits"""
+        with self._lock:
+            return self._connection().execute("PRAGMA data_version").fetchone()[0]
+    
+    # Loads
+    
+    def loads_source(self) -> Optional[str]:
+        """Signature of the loads.json (and row format) the table was last imported from"""
+        with self._lock:
+            return self._meta(self._connection(), "loads_source")
+    
+    def _insert_loads(self, conn: sqlite3.Connection, rows: List[Sequence], verb: str = "INSERT OR REPLACE") -> int:
+        keys = len(self.KEY_COLUMNS)
+        inserted = conn.executemany(
+            f"{verb} INTO loads ({', '.join(self.KEY_COLUMNS)}) VALUES ({', '.join('?' * keys)})",
+            [row[:keys] for row in rows]
+        ).rowcount
+        conn.executemany(
+            f"{verb} INTO load_records (load_id, {', '.join(self.RECORD_COLUMNS)}) VALUES (?, ?, ?, ?)",
+            [(row[0], *row[keys:]) for row in rows]
+        )
+        return inserted
+    
+    def replace_loads(self, rows: List[Sequence], source: str, force: bool = False) -> bool:
+        """
+        Replace the board with `rows`, returning whether it did
+        
+        Unless forced, skipped when the tables already hold `source` - every
+        worker starting together imports the same file, only the first one
+        needs to.
+        """
+        with self._transaction() as conn:
+            if not force and self._meta(conn, "loads_source") == source:
+                return False
+            conn.execute("DELETE FROM loads")
+            conn.execute("DELETE FROM load_records")
+            self._insert_loads(conn, rows)
+            self._set_meta(conn, "loads_source", source)
+            conn.execute("ANALYZE loads")  # planner statistics for the new board
+        return True
+    
+    def add_load(self, row: Sequence) -> bool:
+        with self._transaction() as conn:
+            return self._insert_loads(conn, [row], verb="INSERT OR IGNORE") == 1
+    
+    def remove_load(self, load_id: str) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT load FROM load_records WHERE load_id = ?", (load_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM loads WHERE load_id = ?", (load_id,))
+            conn.execute("DELETE FROM load_records WHERE load_id = ?", (load_id,))
+        return json.loads(row[0])
+    
+    def get_load(self, load_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection().execute("SELECT load FROM load_records WHERE load_id = ?", (load_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def all_loads(self) -> List[Dict]:
+        with self._lock:
+            rows = self._connection().execute("SELECT load FROM load_records ORDER BY rowid").fetchall()
+        return [json.loads(load) for load, in rows]
+    
+    def load_count(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM loads").fetchone()[0]
+    
+    def search_loads(
+        self,
+        columns: Sequence[str],
+        origin_city: Optional[str] = None,
+        origin_state: Optional[str] = None,
+        destination_city: Optional[str] = None,
+        destination_state: Optional[str] = None,
+        equipment_type: Optional[str] = None,
+        pickup_date: Optional[str] = None,
+        limit: int = 10,
+        exclude: Set[str] = frozenset()
+    ) -> List[Tuple]:
+        """
+        (load_id, *columns) of the best paying loads matching the (normalized) filters
+        
+        Same rules as LaneIndex: a location matches on city substring OR
+        exact state, other filters are exact. Matching IDs come best first
+        from the key table, excluded (booked) ones are skipped, and only the
+        `limit` winners' records are read.
+        """
+        where, params = [], []
+        for prefix, city, state in (
+            ("origin", origin_city, origin_state),
+            ("destination", destination_city, destination_state),
+        ):
+            either = []
+            if city is not None:
+                # A "city, st" term: city part as below, state part exact
+                city, _, city_state = city.partition(",")
+                city, city_state = city.strip(), city_state.split(",")[0].strip()
+                # Substring match over the distinct cities (an index-only scan), then indexed lookups
+                match = f"{prefix}_city IN (SELECT DISTINCT {prefix}_city FROM loads WHERE instr({prefix}_city, ?) > 0)"
+                params.append(city)
+                if city_state:
+                    match = f"({match} AND {prefix}_state = ?)"
+                    params.append(city_state)
+                either.append(match)
+            if state is not None:
+                either.append(f"{prefix}_state = ?")
+                params.append(state)
+            if either:
+                where.append("(" + " OR ".join(either) + ")")
+        for column, value in (("equipment_type", equipment_type), ("pickup_date", pickup_date)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        
+        sql = "SELECT load_id FROM loads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # At most len(exclude) of the rows are skipped, so this many always suffice
+        sql += " ORDER BY loadboard_rate DESC, load_id LIMIT ?"
+        params.append(limit + len(exclude))
+        
+        if limit <= 0:
+            return []
+        with self._transaction(write=False) as conn:
+            top_ids = []
+            for load_id, in conn.execute(sql, params):
+                if load_id not in exclude:
+                    top_ids.append(load_id)
+                    if len(top_ids) >= limit:
+                        break
+            records = {
+                row[0]: row for row in conn.execute(
+                    f"SELECT load_id, {', '.join(columns)} FROM load_records "
+                    f"WHERE load_id IN ({', '.join('?' * len(top_ids))})",
+                    top_ids
+                )
+            }
+        return [records[load_id] for load_id in top_ids]
+    
+    # Call records
+    
+    @staticmethod
+    def _call_row(call: Dict) -> Tuple:
+        return (
+            call.get("call_id") or "",
+            call.get("timestamp") or "",
+            call.get("outcome", "unknown"),
+            call.get("sentiment", "neutral"),
+            call.get("negotiation_rounds", 0) or 0,
+            call.get("agreed_rate", 0) or 0,
+            json.dumps(call, separators=(",", ":"))
+        )
+    
+    def _insert_calls(self, conn: sqlite3.Connection, calls: Iterable[Dict]):
+        conn.executemany(
+            "INSERT INTO call_records "
+            "(call_id, timestamp, outcome, sentiment, negotiation_rounds, agreed_rate, call) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [self._call_row(call) for call in calls]
+        )
+    
+    # Hourly and daily totals per (outcome, sentiment), keyed by timestamp prefix
+    ROLLUPS = {"hour": 13, "day": 10}
+    
+    def append_calls(self, calls: List[Dict], durable: bool = False):
+        """Insert calls and their rollups in one transaction, setting each call's seq"""
+        with self._transaction(durable=durable) as conn:
+            for call in calls:
+                row = self._call_row(call)
+                call["seq"] = conn.execute(
+                    "INSERT INTO call_records "
+                    "(call_id, timestamp, outcome, sentiment, negotiation_rounds, agreed_rate, call) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    row
+                ).lastrowid
+                _, timestamp, outcome, sentiment, rounds, agreed_rate, _ = row
+                duration = call.get("call_duration_seconds")
+                conn.executemany(
+                    "INSERT INTO call_rollups VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?) "
+                    "ON CONFLICT DO UPDATE SET "
+                    "calls = calls + 1, "
+                    "negotiation_rounds = negotiation_rounds + excluded.negotiation_rounds, "
+                    "agreed_value = agreed_value + excluded.agreed_value, "
+                    "call_duration_seconds = call_duration_seconds + excluded.call_duration_seconds, "
+                    "timed_calls = timed_calls + excluded.timed_calls",
+                    [
+                        (granularity, timestamp[:width], outcome, sentiment, rounds, agreed_rate,
+                         duration or 0, duration is not None)
+                        for granularity, width in self.ROLLUPS.items()
+                    ]
+                )
+    
+    def rollups_built(self) -> bool:
+        with self._lock:
+            return self._meta(self._connection(), "rollups_built") is not None
+    
+    def build_rollups(self):
+        """Count existing call records into call_rollups (once - inserts keep it current after that)"""
+        with self._transaction() as conn:
+            if self._meta(conn, "rollups_built") is not None:
+                return
+            conn.execute("DELETE FROM call_rollups")
+            for granularity, width in self.ROLLUPS.items():
+                conn.execute(
+                    "INSERT INTO call_rollups "
+                    "SELECT ?, substr(timestamp, 1, ?), outcome, sentiment, COUNT(*), SUM(negotiation_rounds), "
+                    "SUM(agreed_rate), "
+                    "COALESCE(SUM(json_extract(call, '$.call_duration_seconds')), 0), "
+                    "COUNT(json_extract(call, '$.call_duration_seconds')) "
+                    "FROM call_records GROUP BY 2, 3, 4",
+                    (granularity, width)
+                )
+            self._set_meta(conn, "rollups_built", "1")
+    
+    def call_rollups(self, granularity: str, start: str, end: str) -> List[Tuple]:
+        """(bucket, outcome, sentiment, calls, rounds, agreed value, duration, timed calls) rows, oldest first"""
+        width = self.ROLLUPS[granularity]
+        with self._lock:
+            return self._connection().execute(
+                "SELECT bucket, outcome, sentiment, calls, negotiation_rounds, agreed_value, "
+                "call_duration_seconds, timed_calls FROM call_rollups "
+                "WHERE granularity = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (granularity, start[:width], end[:width])
+            ).fetchall()
+    
+    def calls_imported(self) -> bool:
+        with self._lock:
+            return self._meta(self._connection(), "calls_imported") is not None
+    
+    def import_calls(self, calls: List[Dict]) -> bool:
+        """Import existing calls once (the first worker to start wins), returning whether it did"""
+        with self._transaction() as conn:
+            if self._meta(conn, "calls_imported") is not None:
+                return False
+            if not conn.execute("SELECT 1 FROM call_records LIMIT 1").fetchone():
+                self._insert_calls(conn, calls)
+            self._set_meta(conn, "calls_imported", str(len(calls)))
+        return True
+    
+    def last_call_seq(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COALESCE(MAX(seq), 0) FROM call_records").fetchone()[0]
+    
+    def calls_after(self, seq: int, limit: int = -1) -> List[Dict]:
+        """Calls inserted after `seq`, in insertion order (limit -1: all of them)"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT seq, call FROM call_records WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)
+            ).fetchall()
+        return [dict(json.loads(call), seq=seq) for seq, call in rows]
+    
+    def clear_calls(self):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM call_records")
+            conn.execute("DELETE FROM call_rollups")
+    
+    def call_totals(self) -> List[Tuple[str, str, int, int, float, str]]:
+        """(outcome, sentiment, calls, rounds, agreed value, first timestamp) per group, oldest first"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT outcome, sentiment, COUNT(*), SUM(negotiation_rounds), SUM(agreed_rate), MIN(timestamp) "
+                "FROM call_records GROUP BY outcome, sentiment ORDER BY MIN(timestamp)"
+            ).fetchall()
+    
+    def recent_calls(self, limit: int, before: Optional[Tuple[str, str]] = None) -> List[Dict]:
+        """Calls most recent first, starting below a (timestamp, call_id) cursor"""
+        sql = "SELECT seq, call FROM call_records"
+        params: list = []
+        if before is not None:
+            sql += " WHERE (timestamp, call_id) < (?, ?)"
+            params.extend(before)
+        sql += " ORDER BY timestamp DESC, call_id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [dict(json.loads(call), seq=seq) for seq, call in rows]
+
+
+def create_storage(kind: str = "json", path: Optional[str] = None) -> Optional[SQLiteStore]:
+    """Build the engine named by STORAGE_BACKEND - None means the JSON files"""
+    if kind == "sqlite":
+        return SQLiteStore(path or "data/storage.db")
+    if kind != "json":
+        logger.warning(f"Unknown storage backend {kind!r}, using json")
+    return None
@@ -2,7 +2,9 @@
 // When accessed through ngrok or production, use relative URLs
 // This works because FastAPI serves both API and dashboard
 const API_BASE_URL = '';
-const REFRESH_INTERVAL = 10000; // 10 seconds - more responsive updates
+const REFRESH_INTERVAL = 10000; // 10 seconds - polling fallback while /events is down
+const MAX_RECONNECT_DELAY = 30000;
+const CALLS_PAGE_SIZE = 50; // calls fetched per page in the calls view
 
 // Authentication with 1-hour expiration
 function checkApiKeyExpiration() {
@@ -53,6 +55,13 @@ let equipmentFilter = '';
 let searchQuery = '';
 let metrics = null;
 let lastUpdateTime = 0;
+let callHistory = [];
+let callHistoryCursor = null;
+let callHistoryTotal = 0;
+let lastCallSeq = 0;  // highest call seq shown - newer calls are pulled from /metrics/calls/since
+// ETags of the last /metrics and loads responses, sent back as If-None-Match
+let metricsETag = null;
+let loadsETag = null;
 
 // Chart instances
 let outcomesChart = null;
@@ -76,15 +85,133 @@ async function init() {
         });
     }
     
-    // Set up auto-refresh with throttling
-    setInterval(() => {
+    // Live updates are pushed over /events; poll only while it's down
+    connectEvents();
+}
+
+// Polling fallback with throttling
+let pollTimer = null;
+
+function startPolling() {
+    if (pollTimer) return;
+    pollTimer = setInterval(() => {
         const now = Date.now();
         if (now - lastUpdateTime > REFRESH_INTERVAL - 1000) {
             updateDashboard();
+            if (currentView === 'calls') syncCallsTable();
         }
     }, REFRESH_INTERVAL);
 }
 
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+// Server-Sent Events - read with fetch, since EventSource can't send the Authorization header
+let lastEventId = null;
+let reconnectDelay = 1000;
+
+async function connectEvents() {
+    const headers = { 'Authorization': `Bearer ${API_KEY}` };
+    if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+    
+    try {
+        const response = await fetch(`${API_BASE_URL}/events`, { headers, cache: 'no-store' });
+        if (response.status === 403) {
+            handleAuthError();
+            return;
+        }
+        if (!response.ok || !response.body) throw new Error(`HTTP error! status: ${response.status}`);
+        
+        console.log('Event stream connected');
+        stopPolling();
+        reconnectDelay = 1000;
+        if (lastEventId === '') {
+            handleEvent('resync', {});  // reconnected with nothing to resume from
+        } else if (lastEventId === null) {
+            lastEventId = '';  // first connect - the initial fetch is current
+        }
+        
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += value.replace(/\r\n?/g, '\n');
+            let end;
+            while ((end = buffer.indexOf('\n\n')) !== -1) {
+                parseEventFrame(buffer.slice(0, end));
+                buffer = buffer.slice(end + 2);
+            }
+        }
+    } catch (error) {
+        console.error('Event stream error:', error);
+    }
+    
+    // Dropped (or never connected): poll until the stream is back
+    startPolling();
+    setTimeout(connectEvents, reconnectDelay);
+    reconnectDelay = Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY);
+}
+
+function parseEventFrame(frame) {
+    let event = 'message';
+    let data = '';
+    for (const line of frame.split('\n')) {
+        if (line.startsWith(':')) continue;  // keepalive
+        const colon = line.indexOf(':');
+        const field = colon === -1 ? line : line.slice(0, colon);
+        const value = colon === -1 ? '' : line.slice(colon + 1).replace(/^ /, '');
+        if (field === 'event') event = value;
+        else if (field === 'data') data += (data ? '\n' : '') + value;
+        else if (field === 'id') lastEventId = value;
+    }
+    if (!data) return;
+    
+    try {
+        handleEvent(event, JSON.parse(data));
+    } catch (error) {
+        console.error(`Error handling ${event} event:`, error);
+    }
+}
+
+function handleEvent(event, data) {
+    lastUpdateTime = Date.now();
+    
+    switch (event) {
+        case 'call':
+            if (data.seq <= lastCallSeq) break;  // already pulled
+            lastCallSeq = data.seq;
+            callHistory.unshift(data);
+            callHistoryTotal += 1;
+            if (currentView === 'calls') renderCallsTable();
+            break;
+        case 'booking': {
+            const load = allLoads.find(l => l.load_id === data.load_id);
+            if (load && load.status !== 'Booked') {
+                load.status = 'Booked';
+                filterLoads();
+                if (selectedLoad && selectedLoad.load_id === data.load_id) updateLoadDetails();
+            }
+            break;
+        }
+        case 'metrics':
+            metrics = Object.assign(metrics || {}, data);
+            if (currentView === 'analytics') updateAnalytics();
+            break;
+        case 'calls_cleared':
+        case 'bookings_cleared':
+        case 'resync':
+            // Too much changed to patch in place - refetch
+            updateDashboard().then(() => {
+                if (currentView === 'calls') updateCallsTable();
+                if (currentView === 'analytics') updateAnalytics();
+            });
+            break;
+    }
+}
+
 // Switch between main views
 function switchView(view) {
     currentView = view;
@@ -110,7 +237,7 @@ function switchView(view) {
     
     // Update data for the view
     if (view === 'calls') {
-        updateCallsTable();
+        syncCallsTable();
     } else if (view === 'analytics') {
         updateAnalytics();
     }
@@ -178,15 +305,46 @@ function filterLoads() {
 }
 
 // Fetch data from API
+// Unchanged (304) responses resolve to null - keep what we have
 async function fetchMetrics() {
     try {
-        const response = await fetch(`${API_BASE_URL}/metrics`, {
+        const headers = { 'Authorization': `Bearer ${API_KEY}` };
+        if (metricsETag && metrics) headers['If-None-Match'] = metricsETag;
+        const response = await fetch(`${API_BASE_URL}/metrics`, { headers, cache: 'no-store' });
+        if (response.status === 304) return null;
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        metricsETag = response.headers.get('ETag');
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching metrics:', error);
+        return null;
+    }
+}
+
+async function fetchCallsSince(seq) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/metrics/calls/since?seq=${seq}`, {
             headers: { 'Authorization': `Bearer ${API_KEY}` }
         });
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
         return await response.json();
     } catch (error) {
-        console.error('Error fetching metrics:', error);
+        console.error('Error fetching new calls:', error);
+        return null;
+    }
+}
+
+async function fetchCallHistoryPage(cursor) {
+    try {
+        let url = `${API_BASE_URL}/metrics/calls?limit=${CALLS_PAGE_SIZE}`;
+        if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+        const response = await fetch(url, {
+            headers: { 'Authorization': `Bearer ${API_KEY}` }
+        });
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching call history:', error);
         return null;
     }
 }
@@ -194,14 +352,18 @@ async function fetchMetrics() {
 async function fetchLoads() {
     try {
         // Fetch ALL loads including booked ones for dashboard
-        const url = `${API_BASE_URL}/api/v1/loads?include_booked=true&t=${Date.now()}`;
+        const url = `${API_BASE_URL}/api/v1/loads?include_booked=true`;
         console.log('Fetching loads from:', url);
         console.log('With API key:', API_KEY ? 'Yes' : 'No');
         
-        const response = await fetch(url, {
-            headers: { 'Authorization': `Bearer ${API_KEY}` }
-        });
+        const headers = { 'Authorization': `Bearer ${API_KEY}` };
+        if (loadsETag && allLoads.length > 0) headers['If-None-Match'] = loadsETag;
+        const response = await fetch(url, { headers, cache: 'no-store' });
         
+        if (response.status === 304) {
+            console.log('Loads unchanged');
+            return null;
+        }
         if (!response.ok) {
             if (response.status === 403) {
                 handleAuthError();
@@ -209,6 +371,7 @@ async function fetchLoads() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
+        loadsETag = response.headers.get('ETag');
         const data = await response.json();
         const loads = data.body && data.body.loads ? data.body.loads : [];
         
@@ -457,12 +620,60 @@ function updateLoadDetails() {
     `;
 }
 
-// Update calls table
-function updateCallsTable() {
+// Update calls table - first page of call history
+async function updateCallsTable() {
+    const page = await fetchCallHistoryPage(null);
+    if (page) {
+        callHistory = page.calls;
+        callHistoryCursor = page.next_cursor;
+        callHistoryTotal = page.total_calls;
+        lastCallSeq = Math.max(0, ...callHistory.map(call => call.seq || 0));
+    }
+    renderCallsTable();
+}
+
+// Pull only calls logged since the table was last filled
+async function syncCallsTable() {
+    if (callHistory.length === 0) return updateCallsTable();
+    
+    let page;
+    do {
+        page = await fetchCallsSince(lastCallSeq);
+        if (!page) break;
+        if (callHistoryTotal + page.calls.length > page.total_calls) {
+            // More calls than the server has - history was reset
+            return updateCallsTable();
+        }
+        callHistory = page.calls.reverse().concat(callHistory);
+        callHistoryTotal += page.calls.length;
+        lastCallSeq = page.last_seq;
+    } while (page.has_more);
+    renderCallsTable();
+}
+
+// Append the next (older) page of call history
+async function loadMoreCalls() {
+    if (!callHistoryCursor) return;
+    
+    const page = await fetchCallHistoryPage(callHistoryCursor);
+    if (page) {
+        callHistory = callHistory.concat(page.calls);
+        callHistoryCursor = page.next_cursor;
+        callHistoryTotal = page.total_calls;
+    }
+    renderCallsTable();
+}
+
+function renderCallsTable() {
     const tbody = document.getElementById('callsTableBody');
     const callCountElement = document.getElementById('callCount');
+    const loadMoreButton = document.getElementById('loadMoreCalls');
+    
+    if (loadMoreButton) {
+        loadMoreButton.classList.toggle('hidden', !callHistoryCursor);
+    }
     
-    if (!tbody || !metrics || !metrics.recent_calls) {
+    if (!tbody || callHistory.length === 0) {
         if (tbody) {
             tbody.innerHTML = `
                 <tr>
@@ -478,11 +689,11 @@ function updateCallsTable() {
         return;
     }
     
-    const calls = metrics.recent_calls;
+    const calls = callHistory;
     
     // Update call count
     if (callCountElement) {
-        callCountElement.textContent = `${calls.length} call${calls.length !== 1 ? 's' : ''}`;
+        callCountElement.textContent = `${callHistoryTotal} call${callHistoryTotal !== 1 ? 's' : ''}`;
     }
     
     tbody.innerHTML = calls.map(call => {
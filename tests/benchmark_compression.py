@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Compression Benchmark - bytes on the wire and CPU per request, by encoding
+
+Runs in-process against the FastAPI app (no server needed):
+    python tests/benchmark_compression.py
+
+Requests each dashboard payload with Accept-Encoding identity, gzip and br
+(as shipped: CompressionMiddleware defaults, precompressed /static) and
+reports response bytes and process CPU per request. Bodies are read raw, so
+no client-side decompression is counted. The second table sweeps levels
+over the same bodies, which is how the defaults were picked.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault("ACME_API_KEY", "benchmark_key")
+os.chdir(tempfile.mkdtemp())  # keep metrics files out of the repo
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from services.compression import brotli, compress  # noqa: E402
+from services.loads import LoadService  # noqa: E402
+from benchmark_load_search import make_board  # noqa: E402
+
+BOARD_SIZE = 10_000
+CALLS = 1000
+REQUESTS = 300
+HEADERS = {"Authorization": f"Bearer {os.environ['ACME_API_KEY']}"}
+
+CASES = [
+    ("/metrics", "/metrics"),
+    ("dashboard loads (100)", "/api/v1/loads?include_booked=true"),
+    ("HappyRobot search (10)", "/api/v1/loads?origin_state=TX"),
+    ("/static/app.js", "/static/app.js"),
+]
+ENCODINGS = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+LEVELS = [("gzip", 1), ("gzip", 6), ("gzip", 9)]
+if brotli is not None:
+    LEVELS += [("br", 1), ("br", 4), ("br", 6), ("br", 11)]
+
+
+async def skip_auth():
+    return "benchmark"
+
+
+async def fetch_raw(client, path, encoding):
+    """(status, encoding, raw bytes) without decoding the body"""
+    async with client.stream("GET", path, headers={**HEADERS, "Accept-Encoding": encoding}) as response:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+        return response.status_code, response.headers.get("content-encoding", "identity"), body
+
+
+async def measure(client, path, encoding):
+    """(wire bytes, served encoding, CPU ms per request)"""
+    status, served, body = await fetch_raw(client, path, encoding)
+    assert status == 200
+    start = time.process_time()
+    for _ in range(REQUESTS):
+        await fetch_raw(client, path, encoding)
+    return len(body), served, (time.process_time() - start) * 1000 / REQUESTS
+
+
+def level_cost(body, encoding, level, rounds=50):
+    """(compressed bytes, CPU ms per compression)"""
+    start = time.process_time()
+    for _ in range(rounds):
+        compressed = compress(body, encoding, gzip_level=level, brotli_quality=level)
+    return len(compressed), (time.process_time() - start) * 1000 / rounds
+
+
+async def run_benchmark():
+    logging.disable(logging.WARNING)
+    main.app.dependency_overrides[main.verify_api_key] = skip_auth
+    
+    bodies = {}
+    async with main.lifespan(main.app):
+        main.app.state.loads = LoadService(make_board(BOARD_SIZE))
+        for i in range(CALLS):
+            await main.app.state.metrics.log_call(
+                call_id=f"call_LOAD-{i:06d}_{100000 + i}_20250101120000", mc_number=str(100000 + i),
+                carrier_name="Benchmark Trucking LLC", load_id=f"LOAD-{i:06d}",
+                outcome=("booked", "no_agreement", "not_interested")[i % 3],
+                sentiment=("positive", "neutral", "negative")[i % 3], agreed_rate=2500.0 + i,
+                negotiation_rounds=i % 4, call_duration_seconds=180, notes="Carrier accepted after negotiation"
+            )
+        
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            print("\n" + "=" * 78)
+            print(" COMPRESSION BENCHMARK ")
+            print("=" * 78)
+            print(f"{BOARD_SIZE} loads, {CALLS} calls logged, {REQUESTS} requests per row\n")
+            print(f"{'payload':<24} | {'accept':<8} | {'served':<8} | {'bytes':>7} | {'saved':>6} | {'CPU ms/req':>10}")
+            print("-" * 78)
+            for name, path in CASES:
+                identity = None
+                for encoding in ENCODINGS:
+                    size, served, cpu = await measure(client, path, encoding)
+                    identity = identity or (size, cpu)
+                    saved = f"{100 - size * 100 / identity[0]:.0f}%" if encoding != "identity" else "-"
+                    print(f"{name:<24} | {encoding:<8} | {served:<8} | {size:>7} | {saved:>6} | "
+                          f"{cpu:>10.3f}")
+                _, _, bodies[name] = await fetch_raw(client, path, "identity")
+    
+    print(f"\n{'payload':<24} | {'level':<8} | {'bytes':>7} | {'ratio':>6} | {'CPU ms':>7}")
+    print("-" * 64)
+    for name, body in bodies.items():
+        for encoding, level in LEVELS:
+            size, cpu = level_cost(body, encoding, level)
+            print(f"{name:<24} | {encoding + ' ' + str(level):<8} | {size:>7} | "
+                  f"{len(body) / size:>5.1f}x | {cpu:>7.3f}")
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Load Response Benchmark - pre-encoded JSON fast path vs. response_model serialization
+
+Runs in-process against the FastAPI app (no server needed):
+    python tests/benchmark_load_response.py
+
+"before" is the previous code path: the same prebuilt payload dicts
+returned through response_model=HappyRobotResponse, so FastAPI validates and
+re-serializes them. "after" is /api/v1/loads as shipped: cached per-load
+JSON bytes spliced into the envelope.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+os.environ.setdefault("ACME_API_KEY", "benchmark_key")
+os.chdir(tempfile.mkdtemp())  # keep metrics files out of the repo
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from models import HappyRobotResponse  # noqa: E402
+from services.loads import LoadService  # noqa: E402
+from benchmark_load_search import make_board  # noqa: E402
+
+BOARD_SIZE = 10_000
+REQUESTS = 2000
+CONCURRENCY = 20
+HEADERS = {"Authorization": f"Bearer {os.environ['ACME_API_KEY']}"}
+
+CASES = [
+    ("HappyRobot search, 10 loads", "origin_state=TX"),
+    ("dashboard, 100 loads", "include_booked=true"),
+]
+
+
+@main.app.get("/benchmark/legacy-loads", response_model=HappyRobotResponse)
+async def legacy_loads(origin_state: str = None, include_booked: bool = False):
+    """Pre-fast-path response: dicts validated and serialized by FastAPI"""
+    loads = await main.app.state.loads.search_payloads(
+        origin_state=origin_state,
+        max_results=100 if include_booked else 10,
+        include_booked=include_booked
+    )
+    return {"statusCode": 200, "body": {"loads": loads}}
+
+
+async def skip_auth():
+    return "benchmark"
+
+
+async def run_case(client, path):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(REQUESTS):
+        queue.put_nowait(None)
+    
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.get(path, headers=HEADERS)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(CONCURRENCY)])
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    p99 = latencies[int(0.99 * (len(latencies) - 1))] * 1000
+    return REQUESTS / elapsed, p99
+
+
+async def run_benchmark():
+    logging.disable(logging.ERROR)
+    
+    print("\n" + "=" * 70)
+    print(" LOAD RESPONSE BENCHMARK ")
+    print("=" * 70)
+    print(f"{BOARD_SIZE} loads, {REQUESTS} requests per case, concurrency {CONCURRENCY}\n")
+    print(f"{'case':<30} | {'before req/s':>12} | {'after req/s':>11} | {'before p99':>10} | {'after p99':>9}")
+    print("-" * 84)
+    
+    # Measure serialization, not the per-key rate limiter
+    main.app.dependency_overrides[main.verify_api_key] = skip_auth
+    
+    async with main.lifespan(main.app):
+        main.app.state.loads = LoadService(make_board(BOARD_SIZE))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, query in CASES:
+                # Same bytes on the wire either way
+                before = await client.get(f"/benchmark/legacy-loads?{query}", headers=HEADERS)
+                after = await client.get(f"/api/v1/loads?{query}", headers=HEADERS)
+                assert before.json() == after.json()
+                
+                before_rps, before_p99 = await run_case(client, f"/benchmark/legacy-loads?{query}")
+                after_rps, after_p99 = await run_case(client, f"/api/v1/loads?{query}")
+                print(f"{name:<30} | {before_rps:>12.0f} | {after_rps:>11.0f} | "
+                      f"{before_p99:>8.2f}ms | {after_p99:>7.2f}ms")
+    
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Load Search Micro-Benchmark - indexed top-K search vs. the old scan + full sort
+
+Runs in-process against LoadService (no server needed):
+    python tests/benchmark_load_search.py
+"""
+
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+from services.loads import LoadService  # noqa: E402
+
+BOARD_SIZES = [1_000, 10_000, 100_000]
+ITERATIONS = 50
+
+CITIES = [
+    ("Los Angeles", "CA"), ("Chicago", "IL"), ("Houston", "TX"), ("Dallas", "TX"),
+    ("Atlanta", "GA"), ("Miami", "FL"), ("New York", "NY"), ("Denver", "CO"),
+    ("Seattle", "WA"), ("Phoenix", "AZ"), ("Charlotte", "NC"), ("Memphis", "TN"),
+]
+EQUIPMENT = ["Dry Van", "Reefer", "Flatbed"]
+
+
+def make_board(size):
+    random.seed(size)
+    loads = []
+    for i in range(size):
+        origin = random.choice(CITIES)
+        destination = random.choice(CITIES)
+        loads.append({
+            "load_id": f"LOAD-{i:06d}",
+            "origin": f"{origin[0]}, {origin[1]}",
+            "destination": f"{destination[0]}, {destination[1]}",
+            "pickup_datetime": f"2025-11-{random.randint(1, 28):02d}T08:00:00",
+            "delivery_datetime": "2025-11-30T08:00:00",
+            "equipment_type": random.choice(EQUIPMENT),
+            "loadboard_rate": float(random.randint(800, 6000)),
+            "weight": 40000,
+            "commodity_type": "General Freight",
+            "num_of_pieces": 10,
+            "miles": random.randint(200, 2500),
+        })
+    return loads
+
+
+def legacy_search(loads, booked, origin_state=None, max_results=10, include_booked=False):
+    """The pre-index implementation: scan every load, sort every match"""
+    if not origin_state:
+        if include_booked:
+            return sorted(
+                [dict(load, is_booked=load["load_id"] in booked) for load in loads],
+                key=lambda x: x.get("loadboard_rate", 0), reverse=True
+            )
+        available = [load for load in loads if load["load_id"] not in booked]
+        return sorted(available, key=lambda x: x.get("loadboard_rate", 0), reverse=True)
+    
+    results = []
+    for load in loads:
+        if not include_booked and load["load_id"] in booked:
+            continue
+        if origin_state.lower() not in load["origin"].lower():
+            continue
+        results.append(load)
+    results.sort(key=lambda x: x.get("loadboard_rate", 0), reverse=True)
+    return results[:max_results]
+
+
+def time_ms(fn):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1000
+
+
+async def run_benchmark():
+    print("\n" + "=" * 70)
+    print(" LOAD SEARCH MICRO-BENCHMARK ")
+    print("=" * 70)
+    print(f"{ITERATIONS} iterations per case, times are mean ms per search\n")
+    print(f"{'loads':>8} | {'case':<28} | {'legacy':>9} | {'indexed':>9} | {'speedup':>8}")
+    print("-" * 74)
+    
+    logging.disable(logging.INFO)
+    
+    for size in BOARD_SIZES:
+        loads = make_board(size)
+        service = LoadService(loads)
+        for load in loads[::10]:
+            await service.mark_as_booked(load["load_id"])
+        booked = set(service.booked_loads)
+        
+        cases = [
+            ("origin_state=TX, top 10",
+             lambda: legacy_search(loads, booked, origin_state="TX"),
+             lambda: service.search(origin_state="TX")),
+            ("no origin, top 10",
+             lambda: legacy_search(loads, booked),
+             lambda: service.search()),
+            ("no origin, booked, top 100",
+             lambda: legacy_search(loads, booked, include_booked=True),
+             lambda: service.search(max_results=100, include_booked=True)),
+        ]
+        
+        for name, legacy, indexed in cases:
+            legacy_ms = time_ms(legacy)
+            start = time.perf_counter()
+            for _ in range(ITERATIONS):
+                await indexed()
+            indexed_ms = (time.perf_counter() - start) / ITERATIONS * 1000
+            print(f"{size:>8} | {name:<28} | {legacy_ms:>9.3f} | {indexed_ms:>9.3f} | "
+                  f"{legacy_ms / indexed_ms:>7.1f}x")
+    
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
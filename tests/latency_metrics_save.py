@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Metrics Save Latency Test - a large metrics save must not stall load search
+
+Runs in-process against the FastAPI app (no server needed):
+    python tests/latency_metrics_save.py [--calls 300000]
+
+Fills MetricsService with a large call history, then keeps requesting
+/api/v1/loads (every 5 ms) while a snapshot is written. "blocking" is the old path
+(json.dump on the event loop); "I/O thread" is MetricsService.save() as
+shipped. Passes if no search waits anywhere near as long as the save.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+sys.path.insert(0, API_DIR)
+
+os.environ.setdefault("ACME_API_KEY", "latency_key")
+os.chdir(tempfile.mkdtemp())  # keep metrics files out of the repo
+os.makedirs("data")
+shutil.copy(os.path.join(API_DIR, "data", "loads.json"), "data")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+
+HEADERS = {"Authorization": f"Bearer {os.environ['ACME_API_KEY']}"}
+
+
+def blocking_save(metrics):
+    """The pre-executor save: serialize and fsync on the event loop"""
+    with open(metrics.data_path + ".tmp", 'w') as f:
+        json.dump({"generation": 0, "calls": metrics.calls}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(metrics.data_path + ".tmp", metrics.data_path)
+
+
+async def search_latencies(client, until, interval=0.005):
+    """
+    One search every `interval` seconds until `until` resolves (to the time it finished)
+    
+    Latency is measured from when each search was due, like a client
+    outside the process: searches due while the loop is stuck wait.
+    """
+    latencies = []
+    due = time.perf_counter()
+    while not until.done() or due < until.result():  # ...and any that fell due before it did
+        response = await client.get("/api/v1/loads?origin_state=TX", headers=HEADERS)
+        latencies.append((time.perf_counter() - due) * 1000)
+        assert response.status_code == 200
+        due += interval
+        await asyncio.sleep(max(0, due - time.perf_counter()))
+    return latencies
+
+
+async def measure(client, save):
+    """Run `save` while searches are already in flight; (save ms, search latencies)"""
+    done = asyncio.get_running_loop().create_future()
+    searches = asyncio.ensure_future(search_latencies(client, done))
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    await save()
+    save_ms = (time.perf_counter() - start) * 1000
+    done.set_result(time.perf_counter())
+    return save_ms, await searches
+
+
+async def run_test(calls):
+    logging.disable(logging.WARNING)
+    
+    async def skip_auth():
+        return "latency"
+    
+    main.app.dependency_overrides[main.verify_api_key] = skip_auth
+    
+    async with main.lifespan(main.app):
+        metrics = main.app.state.metrics
+        metrics.calls = [
+            {
+                "call_id": f"call_{i:07d}", "mc_number": "123456", "carrier_name": "Latency Test Carrier",
+                "load_id": "LOAD-001", "outcome": "declined", "sentiment": "neutral", "agreed_rate": None,
+                "negotiation_rounds": 2, "call_duration_seconds": 180, "notes": "Rate too low for this lane",
+                "timestamp": f"2025-01-01T00:00:{i % 60:02d}.{i:07d}"
+            }
+            for i in range(calls)
+        ]
+        
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://latency") as client:
+            _, idle = await measure(client, lambda: asyncio.sleep(0.5))
+            
+            async def old_save():
+                blocking_save(metrics)
+            
+            old_ms, old = await measure(client, old_save)
+            new_ms, new = await measure(client, metrics.save)
+    
+    print("\n" + "=" * 70)
+    print(" METRICS SAVE LATENCY TEST ")
+    print("=" * 70)
+    print(f"{calls} calls in history, GET /api/v1/loads?origin_state=TX every 5 ms\n")
+    print(f"{'save':<12} | {'save ms':>8} | {'searches':>8} | {'max search ms':>13}")
+    print("-" * 52)
+    print(f"{'none':<12} | {'-':>8} | {len(idle):>8} | {max(idle):>13.1f}")
+    print(f"{'blocking':<12} | {old_ms:>8.0f} | {len(old):>8} | {max(old):>13.1f}")
+    print(f"{'I/O thread':<12} | {new_ms:>8.0f} | {len(new):>8} | {max(new):>13.1f}")
+    
+    passed = max(new) < new_ms / 4
+    print("\n  ✅ PASS - searches kept running during the save" if passed
+          else "\n  ❌ FAIL - a search waited on the metrics save")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300_000)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run_test(args.calls)) else 1)
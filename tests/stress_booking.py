@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Booking Stress Test - hundreds of simultaneous bookings for one load
+
+Exactly one booking may win; every other one must get a 409, and the
+metrics must agree. In-process against the FastAPI app by default:
+    python tests/stress_booking.py
+
+With --workers N it starts a real server with N worker processes sharing
+a SQLite state backend, so the bookings race across processes:
+    python tests/stress_booking.py --workers 4 --bookings 500
+"""
+
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+sys.path.insert(0, API_DIR)
+
+os.environ.setdefault("ACME_API_KEY", "stress_key")
+
+import httpx  # noqa: E402
+
+HEADERS = {"Authorization": f"Bearer {os.environ['ACME_API_KEY']}"}
+LOAD_ID = "LOAD-001"
+
+
+def booking(i):
+    return {
+        "load_id": LOAD_ID,
+        "mc_number": f"{100000 + i}",
+        "carrier_name": f"Stress Carrier {i}",
+        "carrier_offer": 2500.0,
+        "outcome": "booked",
+        "sentiment": "positive",
+        "negotiation_rounds": 1,
+        "call_duration": 60
+    }
+
+
+async def fire(client, bookings):
+    """Send every booking at once and check exactly one won"""
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/api/v1/offers/log", json=booking(i), headers=HEADERS) for i in range(bookings)
+    ])
+    elapsed = time.perf_counter() - start
+    
+    statuses = collections.Counter(r.json().get("statusCode") for r in responses)
+    metrics = (await client.get("/metrics", headers=HEADERS)).json()
+    outcomes = metrics["calls_by_outcome"]
+    
+    print(f"{bookings} simultaneous bookings for {LOAD_ID} in {elapsed:.2f}s")
+    print(f"  responses: {dict(statuses)}")
+    print(f"  metrics:   {outcomes}")
+    
+    ok = (
+        statuses == {201: 1, 409: bookings - 1}
+        and outcomes.get("booked") == 1
+        and outcomes.get("already_booked") == bookings - 1
+    )
+    print("  ✅ PASS - exactly one winner" if ok else "  ❌ FAIL - double booking or lost bookings")
+    return ok
+
+
+async def run_in_process(bookings):
+    os.chdir(tempfile.mkdtemp())  # fresh metrics, nothing booked yet
+    os.makedirs("data")
+    shutil.copy(os.path.join(API_DIR, "data", "loads.json"), "data")
+    
+    import main
+    
+    async def skip_auth():
+        return "stress"
+    
+    # Stress the booking path, not the per-key rate limiter
+    main.app.dependency_overrides[main.verify_api_key] = skip_auth
+    
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stress") as client:
+            return await fire(client, bookings)
+
+
+async def run_workers(bookings, workers, port=8765):
+    work = tempfile.mkdtemp()
+    os.makedirs(os.path.join(work, "data"))
+    shutil.copy(os.path.join(API_DIR, "data", "loads.json"), os.path.join(work, "data"))
+    env = dict(
+        os.environ,
+        STATE_BACKEND="sqlite",
+        WORKERS=str(workers),
+        PORT=str(port),
+        RATE_LIMIT_REQUESTS=str(bookings * 10)
+    )
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(API_DIR, "main.py")],
+        cwd=work, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        limits = httpx.Limits(max_connections=bookings)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/healthcheck")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            print(f"Server up with {workers} workers (STATE_BACKEND=sqlite)")
+            return await fire(client, bookings)
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=0, help="run a real server with this many workers")
+    args = parser.parse_args()
+    
+    logging.disable(logging.WARNING)
+    if args.workers:
+        passed = asyncio.run(run_workers(args.bookings, args.workers))
+    else:
+        passed = asyncio.run(run_in_process(args.bookings))
+    sys.exit(0 if passed else 1)